@@ -0,0 +1,84 @@
+from MLDashboard.DashboardModules.Module import Module
+from MLDashboard.MLCommunicationBackend import Message, MessageMode
+from MLDashboard.MLSeriesBackend import exponentialSmoothing, expandLimits
+import numpy as np
+
+class BatchMetricsGraph(Module):
+    """
+    Graph of loss and metrics for each training batch. Only the most recent batches in the dashboard's store
+    are drawn, so drawing costs the same no matter how long training runs. Needs send_on_batch_end in the
+    CallbackConfig.
+    """
+    modes = {MessageMode.Train_Batch_End}
+
+    def __init__(self, ax, config):
+        super().__init__(ax, config, "Batch Metrics Graph")
+        if 'window' not in self.config:
+            self.config['window'] = 1000 #number of points shown
+        if 'smoothing' not in self.config:
+            self.config['smoothing'] = 0.0 #exponential moving average weight from 0 (raw) to below 1
+        if 'envelope' not in self.config:
+            self.config['envelope'] = True #draw the min and max of batches merged by the send policy
+
+        #one line per metric in the store's batch group, updated in place
+        self.lines = {}
+        self.envelopes = {}
+        self.ylim = (np.inf, -np.inf)
+        self.xlim = (np.inf, -np.inf)
+
+        self.ax.set_xlabel('Batch')
+
+    def animatedArtists(self):
+        return list(self.lines.values()) + [line for pair in self.envelopes.values() for line in pair]
+
+    def window(self, name: str):
+        """Step, smoothed value, min and max of the newest batches of a metric"""
+        smoothing = self.config['smoothing']
+        window = self.config['window']
+        #earlier batches are smoothed too, until their weight in the first point shown is below 1%
+        warmup = int(np.log(0.01) / np.log(smoothing)) if 0 < smoothing < 1 else 0
+        x, y, low, high = self.store.series('batch', name).latest(window + warmup)
+        y = exponentialSmoothing(y, smoothing)
+        return x[-window:], y[-window:], low[-window:], high[-window:]
+
+    def createLines(self, names):
+        newline = False
+        for key in names:
+            if key not in self.lines:
+                self.lines[key] = self.ax.plot([], [], label=key)[0]
+                if self.config['envelope']:
+                    color = self.lines[key].get_color()
+                    self.envelopes[key] = (self.ax.plot([], [], color=color, alpha=0.3, linewidth=0.8)[0],
+                                           self.ax.plot([], [], color=color, alpha=0.3, linewidth=0.8)[0])
+                newline = True
+        if newline:
+            self.ax.legend(loc='upper right')
+
+    def update(self, data: Message):
+        if data.mode == MessageMode.Train_Batch_End:
+            names = self.store.names('batch')
+            if len(names) == 0:
+                return
+            self.createLines(names)
+
+            low, high, first, last = np.inf, -np.inf, np.inf, -np.inf
+            for key in names:
+                x, y, ymin, ymax = self.window(key)
+                self.lines[key].set_data(x, y)
+                if key in self.envelopes:
+                    self.envelopes[key][0].set_data(x, ymin)
+                    self.envelopes[key][1].set_data(x, ymax)
+                low = min(low, np.nanmin(ymin))
+                high = max(high, np.nanmax(ymax))
+                first = min(first, x[0])
+                last = max(last, x[-1])
+
+            #the x axis only moves every tenth of a window, in between only the lines are redrawn
+            if last > self.xlim[1]:
+                self.xlim = (first, last + max((last - first) / 10, 1))
+                self.ax.set_xlim(self.xlim)
+                self.ylim = (np.inf, -np.inf) #old batches scrolled away, so the range can shrink
+            ylim = expandLimits(self.ylim, low, high)
+            if ylim != self.ylim:
+                self.ylim = ylim
+                self.ax.set_ylim(ylim)
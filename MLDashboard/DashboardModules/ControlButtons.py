@@ -1,8 +1,6 @@
 from MLDashboard.DashboardModules.Module import Module
 from MLDashboard.MLCommunicationBackend import Message, MessageMode
-import matplotlib.pyplot as pyplot
 from matplotlib.widgets import Button
-from mpl_toolkits.axes_grid1.inset_locator import InsetPosition
 import warnings
 import copy
 from typing import List
@@ -13,15 +11,20 @@ warnings.filterwarnings(action='ignore',
                                  'so results might be incorrect.')) #stops buttons from being broken
 
 def createButtonWithingAxes(ax, x, y, width, height, text):
-    button_ax = pyplot.axes([0, 0, 1, 1])
-    ip = InsetPosition(ax, [x, y, width, height])
-    button_ax.set_axes_locator(ip)
+    button_ax = ax.inset_axes([x, y, width, height]) #works with any figure, including headless ones
     return Button(button_ax, text)
 
 class ControlButtons(Module):
+    modes = set() #clicks are sent from poll
     def __init__(self, ax, config):
         """Contains buttons to stop training and save model"""
         super().__init__(ax, config, "Control Buttons", noticks=True)
+        if 'savepath' not in self.config:
+            self.config['savepath'] = 'model_epoch{epoch}.keras' #can use {epoch}, {step} and {time}
+        if 'keep' not in self.config:
+            self.config['keep'] = 0 #number of saves kept, older files are deleted (0 keeps all)
+        if 'compress' not in self.config:
+            self.config['compress'] = False #gzip each save
         self.stopbutton = createButtonWithingAxes(self.ax, 0.2, 0.2, 0.2, 0.1, "Stop Training")
         self.savebutton = createButtonWithingAxes(self.ax, 0.5, 0.2, 0.2, 0.1, "Save Model")
         self.stopbutton.on_clicked(self.stopFunc)
@@ -30,6 +33,9 @@ class ControlButtons(Module):
         self.internalreturnlist: List[Message] = []
 
     def update(self, data: Message):
+        pass
+
+    def poll(self):
         out = copy.deepcopy(self.internalreturnlist)
         self.internalreturnlist = []
         return out
@@ -42,4 +48,7 @@ class ControlButtons(Module):
     def saveFunc(self, event):
         if event == event:
             pass
-        self.internalreturnlist.append(Message(MessageMode.Command, {'command': 'save'}))
\ No newline at end of file
+        self.internalreturnlist.append(Message(MessageMode.Command, {'command': 'save',
+                                                                     'filename': self.config['savepath'],
+                                                                     'keep': self.config['keep'],
+                                                                     'compress': self.config['compress']}))
\ No newline at end of file
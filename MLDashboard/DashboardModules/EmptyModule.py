@@ -2,6 +2,8 @@ from MLDashboard.DashboardModules.Module import Module
 from MLDashboard.MLCommunicationBackend import Message
 
 class EmptyModule(Module):
+    modes = set()
+
     def __init__(self, ax, config):
         """Module with no functionality, used to make a grid of modules"""
         super().__init__(ax, config, "", noticks=True)
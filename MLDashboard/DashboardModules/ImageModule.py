@@ -1,15 +1,26 @@
 from MLDashboard.DashboardModules.Module import Module
-from MLDashboard.MLCommunicationBackend import Message
+from MLDashboard.MLCommunicationBackend import Message, MessageMode
 from PIL import Image
 from typing import List
+import numpy as np
+import hashlib
 
-def compareImages(imga, imgb):
-    if imga == imgb:
-        return True
+class ImageTiles:
+    """
+    Pixels of each tile of the grid layout, ready for AxesImage.set_data, with a digest of each sample as it
+    was received so tiles that did not change are not redrawn.
+    """
+    __slots__ = ('pixels', 'digests')
 
-    if list(imga.getdata()) == list(imgb.getdata()):
-        return True
-    return False
+    def __init__(self, pixels=None, digests: List[bytes] = None):
+        self.pixels = [] if pixels is None else pixels
+        self.digests = [] if digests is None else digests
+
+    def __len__(self):
+        return len(self.digests)
+
+    def __getitem__(self, index: int) -> np.ndarray:
+        return self.pixels[index]
 
 def compareData(itemsa, itemsb, tol):
     for i in range(0, len(itemsa)):
@@ -26,22 +37,44 @@ class ImageModule(Module):
         super().__init__(ax, config, title, noticks=True, reqkeys=basereqkeys)
 
         #defaulting
+        if 'channels' not in self.config:
+            self.config['channels'] = 1 #1 for grayscale, 3 for RGB or 4 for RGBA
+        if 'channelorder' not in self.config:
+            self.config['channelorder'] = 'last' #'last' (NHWC) or 'first' (NCHW)
+        if 'mean' not in self.config:
+            self.config['mean'] = 0.0 #undoes dataset normalization, a number or one per channel
+        if 'std' not in self.config:
+            self.config['std'] = 1.0
         if 'conversion' not in self.config:
-            self.config['conversion'] = 'L' #grayscale
+            self.config['conversion'] = {1: 'L', 3: 'RGB', 4: 'RGBA'}.get(self.config['channels'], 'RGB')
         if 'cmap' not in self.config:
             self.config['cmap'] = 'gray'
+        if 'layout' not in self.config:
+            self.config['layout'] = 'grid' #'grid' (an axes per image) or 'mosaic' (one image for all)
 
         #storage to quickly swap images
         self.axes = []
+        self.artists = [] #one AxesImage per tile, updated with set_data
         self.axtables = []
         self.text = []
-        self.imgs = []
+        if self.config['layout'] == 'mosaic': #pixels from createPixels, none until the first samples arrive
+            depth = (self.config['channels'],) if self.config['channels'] > 1 else ()
+            self.imgs = np.zeros((0, self.config['width'], self.config['height']) + depth, dtype=np.uint8)
+        else:
+            self.imgs = ImageTiles()
         self.isclear = []
 
         self.refreshtimer = 0
         self.initreq = False
         self.imgcounter = 0 #index to grab images from
         self.datarequesttype = datarequesttype
+        self.modes = {datarequesttype, MessageMode.Epoch_End}
+
+        #mosaic layout
+        self.mosaic = None #AxesImage showing every sample
+        self.mosaiccanvas = None #preallocated pixels of the mosaic, gaps are NaN so they are not drawn
+        self.mosaictext = []
+        self.mosaicdigest = None
 
         #old ax info
         self.axx = 0
@@ -75,13 +108,65 @@ class ImageModule(Module):
             return [Message(self.datarequesttype, d)]
 
 
+    def commit(self, data, prepared):
+        if prepared is not None: #images, text and colors built by prepare
+            self.updateImageGrid(*prepared)
+            return None
+        return self.update(data)
+
+    def animatedArtists(self):
+        if self.mosaic is None:
+            return [] #grid tiles are separate axes, so they can't be blitted with this module
+        return [self.mosaic] + self.mosaictext
+
+    def createPixels(self, rawdata) -> np.ndarray:
+        """
+        Converts a batch of samples to uint8 pixels in one vectorized pass. Samples may be flat or shaped,
+        with channels last (NHWC) or first (NCHW). Floats are de-normalized with mean and std and are then
+        expected to be 0 to 1, uint8 samples are used as they are.
+        Returns an array of (samples, width, height), with a channel axis at the end if there is more than one.
+        """
+        rawdata = np.asarray(rawdata)
+        channels = self.config['channels']
+        width, height = self.config['width'], self.config['height']
+        if self.config['channelorder'] == 'first':
+            batch = rawdata.reshape(len(rawdata), channels, width, height).transpose(0, 2, 3, 1)
+        else:
+            batch = rawdata.reshape(len(rawdata), width, height, channels)
+
+        if batch.dtype == np.uint8:
+            pixels = np.array(batch, order='C') #copied, the samples may be a view into shared memory
+        else:
+            #x * std + mean then scaled to 0 to 255, with one temporary array for the whole batch
+            scale = np.asarray(self.config['std'], dtype=np.float32) * 255
+            offset = np.asarray(self.config['mean'], dtype=np.float32) * 255
+            scaled = np.multiply(batch, scale, dtype=np.float32)
+            np.add(scaled, offset, out=scaled)
+            pixels = np.clip(scaled, 0, 255, out=scaled).astype(np.uint8)
+        return pixels[..., 0] if channels == 1 else pixels
+
     def createImages(self, rawdata):
-        images = []
-        for image in rawdata:
-            image = image.reshape(self.config['width'],self.config['height'])
-            img = Image.fromarray(image * 255)
-            images.append(img.convert(self.config['conversion']))
-        return images
+        """
+        Rawdata may be a view into shared memory, so it is only read here and never kept.
+        Safe to call from prepare. With the mosaic layout this returns the array from createPixels,
+        otherwise ImageTiles with the same pixels. PIL is only used when conversion changes the mode.
+        """
+        pixels = self.createPixels(rawdata)
+        if self.config['layout'] == 'mosaic':
+            return pixels
+        mode = {1: 'L', 3: 'RGB', 4: 'RGBA'}.get(self.config['channels'])
+        if self.config['conversion'] != mode:
+            pixels = [self.convertPixels(tile) for tile in pixels]
+        #hashes the arrays as received
+        digests = [hashlib.blake2b(np.ascontiguousarray(sample), digest_size=16).digest() for sample in rawdata]
+        return ImageTiles(pixels, digests)
+
+    def convertPixels(self, tile: np.ndarray) -> np.ndarray:
+        """Converts a tile to the conversion mode with PIL. Modes matplotlib can't draw are shown as RGBA."""
+        img = Image.fromarray(tile).convert(self.config['conversion'])
+        if img.mode not in ['L', 'RGB', 'RGBA']:
+            img = img.convert('RGBA')
+        return np.asarray(img)
 
     def updateImageGrid(self, imgs = None, text = None, color=None):
         """Will not rerender unless it is necessary."""
@@ -91,6 +176,9 @@ class ImageModule(Module):
             text = self.text
         if color is None:
             color = ['black'] * len(text)
+        if self.config['layout'] == 'mosaic':
+            self.updateMosaic(imgs, text, color)
+            return
 
         if len(imgs) > 0:
             b = self.ax.get_position()
@@ -123,28 +211,33 @@ class ImageModule(Module):
 
                     if counter >= len(self.axes):
                         if counter < len(imgs):
-                            ax, table = self.displayImage(xcoord, ycoord, truewidth, trueheight,
-                                                               imgs[counter], text[counter], color[counter])
+                            ax, table, artist = self.displayImage(xcoord, ycoord, truewidth, trueheight,
+                                                                  imgs[counter], text[counter], color[counter])
                             self.axes.append(ax)
                             self.axtables.append(table)
+                            self.artists.append(artist)
                             self.isclear.append(False)
                     else:
                         if rerender:
                             self.axes[counter].set_position((xcoord, ycoord, truewidth, trueheight))
 
                         if counter < len(imgs):
-                            if counter >= len(self.text) or text[counter] != self.text[counter]:
+                            if (self.isclear[counter] or counter >= len(self.text) or
+                                    text[counter] != self.text[counter]):
                                 t = self.axtables[counter][0,0].get_text()
                                 t.set_text(text[counter])
                                 t.set_color(color[counter])
                                 t.set_fontsize(12) #this gets auto scaled down
-                            if counter >= len(self.imgs) or not compareImages(imgs[counter], self.imgs[counter]):
-                                self.axes[counter].imshow(imgs[counter], cmap=self.config['cmap'])
+                            if (self.isclear[counter] or counter >= len(self.imgs) or
+                                    imgs.digests[counter] != self.imgs.digests[counter]):
+                                self.artists[counter].set_data(imgs[counter])
+                                self.artists[counter].set_visible(True)
                                 self.isclear[counter] = False
                                 self.axes[counter].axis('on')
                         else:
                             if not self.isclear[counter]:
-                                self.axes[counter].clear()
+                                self.artists[counter].set_visible(False)
+                                self.axtables[counter][0, 0].get_text().set_text("")
                                 self.isclear[counter] = True
                                 self.axes[counter].axis('off')
 
@@ -156,11 +249,68 @@ class ImageModule(Module):
         self.text = text
 
 
+    def updateMosaic(self, pixels: np.ndarray, text, color):
+        """
+        Draws every sample as a tile of one image on this module's axes, with a text label above each tile.
+        The first sample is in the bottom left, like the grid layout.
+        Grayscale tiles use cmap. Color tiles are drawn as RGBA, and gaps are transparent in both cases.
+        """
+        if len(pixels) == 0: #Epoch_End can arrive before any samples
+            return
+
+        rows = self.config['rows']
+        cols = self.config['cols']
+        tileh, tilew = self.config['width'], self.config['height'] #same order as createPixels
+        gap = max(tileh // 3, 4) #room for the labels
+        pad = max(tilew // 8, 2)
+        iscolor = self.config['channels'] > 1
+        depth = (4,) if iscolor else ()
+        canvasshape = (rows * (gap + tileh), cols * (tilew + pad)) + depth
+
+        if self.mosaic is None:
+            if iscolor: #alpha 0 in the gaps
+                self.mosaiccanvas = np.zeros((rows, gap + tileh, cols, tilew + pad) + depth, dtype=np.uint8)
+            else: #NaN in the gaps
+                self.mosaiccanvas = np.full((rows, gap + tileh, cols, tilew + pad), np.nan, dtype=np.float32)
+            self.mosaic = self.ax.imshow(self.mosaiccanvas.reshape(canvasshape),
+                                         cmap=self.config['cmap'], vmin=0, vmax=255, interpolation='nearest')
+            for i in range(0, rows * cols):
+                x = (i % cols) * (tilew + pad) + tilew / 2
+                y = (rows - 1 - i // cols) * (gap + tileh) + gap / 2
+                self.mosaictext.append(self.ax.text(x, y, "", ha='center', va='center', fontsize=8))
+
+        count = min(len(pixels), rows * cols)
+        digest = hashlib.blake2b(np.ascontiguousarray(pixels[:count]), digest_size=16).digest()
+        if digest != self.mosaicdigest:
+            if iscolor:
+                tiles = np.zeros((rows * cols, tileh, tilew, 4), dtype=np.uint8)
+                tiles[:count, ..., :pixels.shape[-1]] = pixels[:count]
+                if pixels.shape[-1] < 4:
+                    tiles[:count, ..., 3] = 255
+            else:
+                tiles = np.full((rows * cols, tileh, tilew), np.nan, dtype=np.float32)
+                tiles[:count] = pixels[:count]
+            #tiles in display order: (row, pixel row, col, pixel col), with the first row at the bottom
+            tiles = tiles.reshape((rows, cols, tileh, tilew) + depth)[::-1].swapaxes(1, 2)
+            self.mosaiccanvas[:, gap:, :, :tilew] = tiles
+            self.mosaic.set_data(self.mosaiccanvas.reshape(canvasshape))
+            self.mosaicdigest = digest
+
+        for i, label in enumerate(self.mosaictext):
+            newtext = str(text[i]) if i < min(count, len(text)) else ""
+            if label.get_text() != newtext:
+                label.set_text(newtext)
+            if i < len(color) and label.get_color() != color[i]:
+                label.set_color(color[i])
+
+        self.imgs = pixels
+        self.text = text
+
     def displayImage(self, x, y, width, height, img, text, textcolor='black'):
         #imshow will only shrink and resize axes
         fig = self.ax.get_figure()
         ax = fig.add_axes((x, y, width, height))
-        ax.imshow(img, cmap=self.config['cmap'])
+        artist = ax.imshow(img, cmap=self.config['cmap'], vmin=0, vmax=255) #fixed range so set_data can be used
         ax.tick_params(axis='both', which='both', bottom=False, top=False,
                                 labelbottom=False, right=False, left=False, labelleft=False)
 
@@ -169,4 +319,4 @@ class ImageModule(Module):
         table[0, 0].set_height(0.2)
         table[0,0].get_text().set_fontsize(12)  # this gets auto scaled down
         table[0,0].set_linewidth(0)
-        return ax, table
\ No newline at end of file
+        return ax, table, artist
\ No newline at end of file
@@ -1,42 +1,57 @@
 from MLDashboard.DashboardModules.Module import Module
 from MLDashboard.MLCommunicationBackend import Message, MessageMode
+from MLDashboard.MLSeriesBackend import expandLimits
+import numpy as np
 
 class LossMetricsGraph(Module):
     """Graph showing current loss, accuracy, and other metrics."""
+    modes = {MessageMode.Epoch_End}
+
     def __init__(self, ax, config):
         super().__init__(ax, config, "Loss Metrics Graph")
-        self.loss = []
-        self.losscolor = ""
-        self.metrics = {}
-        self.metriccolors = {}
+        if 'downsampling' not in self.config:
+            self.config['downsampling'] = 'lttb' #lttb or minmax
+        if 'pixelbudget' not in self.config:
+            self.config['pixelbudget'] = None #points per line, defaults to the width of the graph in pixels
+
+        #one line per metric in the dashboard's store, updated in place as epochs are added
+        self.lines = {}
+        self.ylim = (np.inf, -np.inf)
 
         self.ax.set_xlabel('Epoch')
 
+    def animatedArtists(self):
+        return list(self.lines.values())
+
     def update(self, data: Message):
         if data.mode == MessageMode.Epoch_End:
-            self.loss.append(data.body['loss'])
-
-            for key in data.body:
-                if key not in ['loss', 'epoch']:
-                    sublist = self.metrics.get(key, [])
-                    sublist.append(data.body[key])
-                    self.metrics[key] = sublist
-
-            for key in self.metrics:
-                if key not in self.metriccolors:
-                    self.metriccolors[key] = self.ax.plot(range(1, len(self.metrics[key]) + 1),
-                                                          self.metrics[key], label=key)[0].get_c()
-                else:
-                    self.ax.plot(range(len(self.metrics[key]) - 1, len(self.metrics[key]) + 1),
-                                 self.metrics[key][-2:], color=self.metriccolors[key])
-
-            if self.losscolor == "":
-                self.losscolor = self.ax.plot(range(1, len(self.loss) +1), self.loss, label='loss')[0].get_c()
+            names = self.store.names('epoch')
+            series = {key: self.store.series('epoch', key) for key in names if key != 'loss'}
+            if 'loss' in names:
+                series['loss'] = self.store.series('epoch', 'loss')
+            if len(series) == 0:
+                return
+            newline = False
+            for key in series:
+                if key not in self.lines:
+                    self.lines[key] = self.ax.plot([], [], label=key)[0]
+                    newline = True
+
+            budget = self.config['pixelbudget'] or max(int(self.ax.bbox.width), 3)
+            for key, s in series.items():
+                self.lines[key].set_data(*s.downsampled(budget, self.config['downsampling']))
+
+            if newline:
                 self.ax.legend()
-            else:
-                self.ax.plot(range(len(self.loss) - 1, len(self.loss) + 1), self.loss[-2:], color=self.losscolor)
 
-            ticks = list(range(0, len(self.loss), int((len(self.loss)-1)/10 + 1)))
+            ylim = expandLimits(self.ylim, min(s.ymin for s in series.values()),
+                                max(s.ymax for s in series.values()))
+            if ylim != self.ylim:
+                self.ylim = ylim
+                self.ax.set_ylim(ylim)
+
+            epochs = self.store.counts['epoch']
+            ticks = list(range(0, epochs, int((epochs-1)/10 + 1)))
             if len(ticks) == 1:
                 ticks = [1]
             elif len(ticks) > 1 and ticks[1] == 1:
@@ -44,6 +59,6 @@ class LossMetricsGraph(Module):
                     ticks[i] += 1
             else:
                 ticks.append(ticks[-1] * 2 - ticks[-2])
-            self.ax.set_xticks(ticks)
-            self.ax.set_xlim(right=ticks[-1]+1)
-
+            if list(self.ax.get_xticks()) != ticks:
+                self.ax.set_xticks(ticks)
+                self.ax.set_xlim(0, ticks[-1]+1)
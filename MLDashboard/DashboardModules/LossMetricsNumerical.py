@@ -4,6 +4,8 @@ import warnings
 
 class LossMetricsNumerical(Module):
     """Shows loss, accuracy, and other metrics by listing stats. Also shows evaluation stats at end."""
+    modes = {MessageMode.Epoch_End, MessageMode.Test_End}
+
     def __init__(self, ax, config):
         super().__init__(ax, config, "Loss Metrics Info", noticks=True)
         self.ax.axis([0, 10, 0, 10])
@@ -14,6 +16,9 @@ class LossMetricsNumerical(Module):
         self.pos = 0
 
 
+    def animatedArtists(self):
+        return [self.epochtext, self.losstext] + self.othertext
+
     def update(self, data: Message):
         if data.mode == MessageMode.Epoch_End:
             self.epochtext.set_text("Epoch: " + str(round(data.body["epoch"] + 1, 3)))
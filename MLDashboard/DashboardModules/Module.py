@@ -1,8 +1,11 @@
 from MLDashboard.MLCommunicationBackend import Message
-from typing import List
+from typing import List, Union
 import warnings
 
 class Module:
+    modes = None #MessageModes that update is called with, None for every message
+    store = None #MetricsStore with every metric received, set by the dashboard
+
     def __init__(self, ax, config: dict, title: str, noticks=False, reqkeys: List[str] = None):
         """
         Creates a module in a axes
@@ -29,6 +32,33 @@ class Module:
     def initialRequests(self):
         pass
 
+    def prepare(self, data: Message):
+        """
+        Optional first half of an update that runs on a worker thread, for work like building images.
+        It must not touch matplotlib or change anything commit uses. The result is passed to commit.
+        """
+        return None
+
+    def commit(self, data: Message, prepared):
+        """Second half of an update, run on the main thread with the result of prepare. Returns requests."""
+        return self.update(data)
+
+    def poll(self) -> Union[List[Message], None]:
+        """
+        Called once per dashboard loop, whether or not any message arrived. Returns requests like update does.
+        Used by modules that create requests on their own, such as buttons.
+        """
+        return None
+
+    def animatedArtists(self) -> list:
+        """
+        Artists that change often, such as text that is updated every epoch.
+        If only these change, the dashboard redraws them on top of a cached background instead of redrawing
+        the whole figure. They must be direct children of self.ax, and changes to anything else still
+        cause a full redraw.
+        """
+        return []
+
     def update(self, data: Message):
         if self == self:
             pass
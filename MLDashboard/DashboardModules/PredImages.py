@@ -16,7 +16,7 @@ class PredImages(ImageModule):
             self.config['incorrectcolor'] = 'red'
 
 
-    def update(self, data):
+    def prepare(self, data):
         if data.mode == MessageMode.Pred_Sample:
             images = self.createImages(data.body['x'])
             text = []
@@ -27,8 +27,11 @@ class PredImages(ImageModule):
                     color.append(self.config['correctcolor'])
                 else:
                     color.append(self.config['incorrectcolor'])
+            return images, text, color
 
-            self.updateImageGrid(images, text, color)
+    def update(self, data):
+        if data.mode == MessageMode.Pred_Sample:
+            self.updateImageGrid(*self.prepare(data))
 
         elif data.mode == MessageMode.Epoch_End:
             self.updateImageGrid()
@@ -4,27 +4,44 @@ from matplotlib.patches import Rectangle
 
 class StatusModule(Module):
     """Module that shows current dashboard status info. Useful for monitoring performance."""
+    modes = {MessageMode.CustomData, MessageMode.Model_Saved}
+
     def __init__(self, ax, config):
         super().__init__(ax, config, "Dashboard Status", noticks=True)
         self.ax.axis([0, 10, 0, 10])
         self.modetext = self.ax.text(1, 9, "Current Mode: ")
         self.autorendertext = self.ax.text(1, 8, "Autorendering: ")
         self.timertext = self.ax.text(1, 7, "Timer: ")
+        self.coalescedtext = self.ax.text(1, 6, "Coalesced: ")
+        self.savetext = self.ax.text(1, 0.3, "")
 
         self.rects = [] #holds comparative speed rects after first update call
         self.borderrects = []
 
+    def animatedArtists(self):
+        return ([self.autorendertext, self.timertext, self.coalescedtext, self.savetext] +
+                [r for r in self.rects if r.axes is not None])
+
     def update(self, data: Message):
+        if data.mode == MessageMode.Model_Saved:
+            if data.body['error'] is None:
+                self.savetext.set_text("Saved: " + str(data.body['path']) + " (" +
+                                       str(round(data.body['duration'], 2)) + "s)")
+            else:
+                self.savetext.set_text("Save failed: " + str(data.body['error']))
+
         if data.mode == MessageMode.CustomData:
             self.modetext.set_text("Current Mode: " + str(data.body["currentmode"]))
 
             if data.body["currentmode"] == "Live Render":
                 self.autorendertext.set_text("Autorendering: " + str(data.body["autorendering"]))
                 self.timertext.set_text("Timer: " + str(data.body["timer"]))
+                self.coalescedtext.set_text("Coalesced: " + str(data.body.get("coalesced", 0)))
 
             else:
                 self.autorendertext.set_text("")
                 self.timertext.set_text("")
+                self.coalescedtext.set_text("")
                 for rect in self.borderrects + self.rects:
                     rect.remove()
 
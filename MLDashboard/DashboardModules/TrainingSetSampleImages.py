@@ -14,11 +14,13 @@ class TrainingSetSampleImages(ImageModule):
     def initialRequests(self):
         return self.generateRequest()
 
+    def prepare(self, data):
+        if data.mode == MessageMode.Train_Set_Sample:
+            return self.createImages(data.body['x']), data.body['y']
+
     def update(self, data):
         if data.mode == MessageMode.Train_Set_Sample:
-            images = self.createImages(data.body['x'])
-            text = data.body['y']
-            self.updateImageGrid(images, text)
+            self.updateImageGrid(*self.prepare(data))
 
         elif data.mode == MessageMode.Epoch_End:
             self.updateImageGrid()
@@ -14,7 +14,7 @@ class WrongPredImages(ImageModule):
             if key not in self.config:
                 self.config[key] = value
 
-    def update(self, data):
+    def prepare(self, data):
         if data.mode == MessageMode.Wrong_Pred_Sample:
             images = self.createImages(data.body['x'])
             text = []
@@ -22,7 +22,11 @@ class WrongPredImages(ImageModule):
             for i in range(0, len(images)):
                 text.append(str(data.body['pred'][i]) + " : " + str(data.body['y'][i]))
                 color.append(self.config['incorrectcolor'])
-            self.updateImageGrid(images, text, color)
+            return images, text, color
+
+    def update(self, data):
+        if data.mode == MessageMode.Wrong_Pred_Sample:
+            self.updateImageGrid(*self.prepare(data))
 
         elif data.mode == MessageMode.Epoch_End:
             self.updateImageGrid()
@@ -21,7 +21,7 @@ def get_model():
 
     return model
 
-def run(testmode=False):
+def run(testmode=False, asyncrequests=True):
     print("Starting interactive dashboard demo...")
     print("Setting up dashboard...")
 
@@ -51,7 +51,8 @@ def run(testmode=False):
     print("Creating callbacks...")
     #Callbacks require update and return list for communicating with dashboard
     #Model and datasets are useful for sending that data to certain modules
-    config = CallbackConfig()
+    #Image requests are handled on a background thread so they don't slow down training
+    config = CallbackConfig(async_data_requests=asyncrequests)
     labels = list(range(0,10))
     #labels = ['zero', 'one', 'two', 'three', 'four', 'five', 'six', 'seven', 'eight', 'nine']
     callback = DashboardCallbacks(updatelist, returnlist, model, x_train, y_train, x_test, y_test, labels, config)
@@ -60,6 +61,7 @@ def run(testmode=False):
     trainingstarttime = time.time()
     model.fit(x_train, y_train, epochs=50, callbacks=[callback])
     print("Training finished in: ", round(time.time() - trainingstarttime, 3), " seconds.")
+    print("Dashboard data requests used: ", round(callback.requesttime, 3), " seconds of training time.")
 
     print("Evaluating model...")
     model.evaluate(x_test, y_test, batch_size=128, callbacks=[callback])
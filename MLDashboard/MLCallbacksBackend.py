@@ -1,16 +1,121 @@
 from MLDashboard.MLCommunicationBackend import Message, MessageMode
+from MLDashboard.MLDataSourceBackend import DataSource, createDataSource
+from MLDashboard.MLTransportBackend import takeMessages
 from tensorflow.keras.callbacks import Callback
+from tensorflow.keras.models import clone_model
 import numpy as np
+import threading
 import warnings
-from typing import List
-
+import shutil
+import queue
+import gzip
+import time
+import os
+from typing import List, Union
+
+
+class BatchEnvelope:
+    """
+    Merges the logs of several batches into one message body. Each metric is sent as its mean, with the smallest
+    and largest value in 'min' and 'max'. Values that are not numbers (such as predict outputs) are taken from
+    the last batch.
+    """
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.sums = {}
+        self.mins = {}
+        self.maxs = {}
+
+    def add(self, logs: dict):
+        for key, value in logs.items():
+            if key in ['batch', 'step'] or np.ndim(value) != 0:
+                continue
+            value = float(value)
+            if key in self.sums:
+                self.sums[key] += value
+                self.mins[key] = min(self.mins[key], value)
+                self.maxs[key] = max(self.maxs[key], value)
+            else:
+                self.sums[key] = value
+                self.mins[key] = value
+                self.maxs[key] = value
+        self.count += 1
+
+    def flush(self, logs: dict) -> dict:
+        """Returns the merged body, using logs (the most recent batch) for everything that is not averaged"""
+        body = dict(logs)
+        body.update({key: total / self.count for key, total in self.sums.items()})
+        body.update({'count': self.count, 'min': self.mins, 'max': self.maxs})
+        self.reset()
+        return body
+
+class SendPolicy:
+    """
+    Decides which batch end messages are sent to the dashboard. Batches that are not sent are merged into the
+    next message that is, so nothing is lost, and the cost per batch stays small and predictable.
+    """
+    def __init__(self, every: int = 1, maxrate: float = None, adaptive: bool = False, maxbacklog: int = 50,
+                 aggregate: bool = True):
+        """
+        :param every: Send at most one message every this many batches
+        :param maxrate: Maximum messages per second (None for no limit)
+        :param adaptive: Send less often while the dashboard has more than maxbacklog messages waiting
+        :param maxbacklog: Number of waiting messages where adaptive backoff starts
+        :param aggregate: Send the mean, min and max of skipped batches instead of only the latest batch
+        """
+        self.every = max(int(every), 1)
+        self.maxrate = maxrate
+        self.adaptive = adaptive
+        self.maxbacklog = maxbacklog
+        self.aggregate = aggregate
+
+        self.interval = self.every #batches per message, grows during adaptive backoff
+        self.pending = 0 #batches since the last message
+        self.lastsend = 0.0
+        self.envelope = BatchEnvelope()
+
+    def offer(self, logs: dict, updatelist: List[Message]) -> Union[dict, None]:
+        """Adds a batch. Returns the body to send, or None if nothing should be sent for this batch."""
+        if self.interval == 1 and self.maxrate is None and not self.adaptive:
+            return logs #every batch is sent
+        self.pending += 1
+        if self.aggregate:
+            self.envelope.add(logs)
+        if self.pending < self.interval:
+            return None
+
+        if self.maxrate is not None:
+            now = time.monotonic()
+            if now - self.lastsend < 1 / self.maxrate:
+                return None
+            self.lastsend = now
+
+        if self.adaptive:
+            backlog = len(updatelist) #messages the dashboard has not read yet
+            if backlog > self.maxbacklog:
+                self.interval = min(self.interval * 2, self.every * 1024)
+                self.pending = 0 #merged batches are kept until the dashboard catches up
+                return None
+            elif backlog < self.maxbacklog // 4 and self.interval > self.every:
+                self.interval = max(self.interval // 2, self.every)
+
+        self.pending = 0
+        if not self.aggregate or self.envelope.count == 1:
+            self.envelope.reset()
+            return logs
+        return self.envelope.flush(logs)
 
 class CallbackConfig:
     """Customize when data is send to the dashboard"""
     def __init__(self, send_on_train_start = True, send_on_train_end = True, send_on_test_start = True,
                  send_on_test_end = True, send_on_predict_start = True, send_on_predict_end = True,
                  send_on_epoch_end = True, send_on_batch_end = False, send_on_test_batch_end = False,
-                 send_on_predict_batch_end = False, force_update_on_epoch_end=True):
+                 send_on_predict_batch_end = False, force_update_on_epoch_end=True, async_data_requests=False,
+                 train_batch_policy: SendPolicy = None, test_batch_policy: SendPolicy = None,
+                 predict_batch_policy: SendPolicy = None, flush_timeout: float = 0.0):
 
         self.send_on_train_start = send_on_train_start
         self.send_on_train_end = send_on_train_end
@@ -23,11 +128,197 @@ class CallbackConfig:
         self.send_on_batch_end = send_on_batch_end #this can quickly overwhelm the dashboard
         self.send_on_test_batch_end = send_on_test_batch_end
         self.send_on_predict_batch_end = send_on_predict_batch_end
+        #decide how often batch end messages are sent, skipped batches are merged into the next message
+        self.train_batch_policy = train_batch_policy if train_batch_policy is not None else SendPolicy()
+        self.test_batch_policy = test_batch_policy if test_batch_policy is not None else SendPolicy()
+        self.predict_batch_policy = predict_batch_policy if predict_batch_policy is not None else SendPolicy()
 
         #batch begin does not contain any keys
 
         self.force_update_on_epoch_end = force_update_on_epoch_end #redraws the screen
 
+        #serve image requests on a background thread with a copy of the model, so training does not wait for them
+        self.async_data_requests = async_data_requests
+
+        #seconds the end of training waits for the socket transport to send queued messages, 0 never waits
+        self.flush_timeout = flush_timeout
+
+dataRequestModes = [MessageMode.Train_Set_Sample, MessageMode.Test_Set_Sample, MessageMode.Pred_Sample,
+                    MessageMode.Pred_Sample_Train, MessageMode.Wrong_Pred_Sample, MessageMode.Wrong_Pred_Sample_Train]
+
+class PredictionCache:
+    """
+    Predicted class of each row of a dataset. Rows stay cached until the weights change, so requests that
+    overlap are served by a single predict call. Also remembers where the last wrong prediction search stopped,
+    so each search continues through the dataset instead of starting over.
+    The size of streamed datasets is not known until they end, so the cache grows with the rows scored.
+    """
+    def __init__(self, source: DataSource):
+        self.source = source
+        self.cursor = 0
+        self.generation = 0 #incremented when the weights change, rows scored in older generations are stale
+        capacity = source.length if source.length is not None else 1024
+        self.scored = np.full(capacity, -1, dtype=np.int64)
+        self.preds = np.zeros(capacity, dtype=np.int64)
+
+    @property
+    def size(self):
+        return self.source.length
+
+    def reserve(self, size: int):
+        if size > len(self.scored):
+            capacity = max(size, len(self.scored) * 2)
+            self.scored = np.concatenate([self.scored, np.full(capacity - len(self.scored), -1, dtype=np.int64)])
+            self.preds = np.concatenate([self.preds, np.zeros(capacity - len(self.preds), dtype=np.int64)])
+
+    def invalidate(self):
+        self.generation += 1
+
+    def nextRows(self, attempts: int) -> np.ndarray:
+        """Indices of the next rows to search for wrong predictions, wrapping around the end of the dataset"""
+        if self.size is None:
+            self.source.available(self.cursor + attempts) #streams find their length when they end
+        if self.size is None:
+            return self.cursor + np.arange(0, attempts)
+        return (self.cursor + np.arange(0, min(attempts, self.size))) % max(self.size, 1)
+
+    def advance(self, row: int):
+        """Continues the next search after this row"""
+        self.cursor = row + 1 if self.size is None else (row + 1) % max(self.size, 1)
+
+    def unscored(self, rows: np.ndarray) -> np.ndarray:
+        self.reserve(int(rows.max()) + 1 if len(rows) > 0 else 0)
+        return rows[self.scored[rows] != self.generation]
+
+    def score(self, rows: np.ndarray, preds: np.ndarray):
+        self.preds[rows] = preds
+        self.scored[rows] = self.generation
+
+class PredictionWorker:
+    """
+    Serves data requests on a background thread. Each job carries a snapshot of the weights, which are loaded
+    into a copy of the model, so predictions never touch the model that is training.
+    """
+    def __init__(self, callbacks, model):
+        self.callbacks = callbacks
+        self.model = model
+        self.jobs = queue.Queue()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def submit(self, weights, requests: List[Message], invalidate: bool):
+        self.jobs.put((weights, requests, invalidate))
+
+    def wait(self):
+        """Blocks until every submitted job has been sent to the dashboard"""
+        self.jobs.join()
+
+    def run(self):
+        while True:
+            weights, requests, invalidate = self.jobs.get()
+            try:
+                self.model.set_weights(weights)
+                self.callbacks.serveDataRequests(requests, invalidate)
+            except Exception as e:
+                warnings.warn("Data requests could not be handled: " + str(e))
+            finally:
+                self.jobs.task_done()
+
+def copyModel(model):
+    """
+    Copy of a model compiled the same way, with its optimizer built so a snapshot of the optimizer state can be
+    loaded into it. Raises if the copy can't hold the same state.
+    """
+    copy = clone_model(model)
+    optimizer = getattr(model, 'optimizer', None)
+    if optimizer is not None:
+        copy.compile_from_config(model.get_compile_config())
+        copy.optimizer.build(copy.trainable_variables)
+        if len(copy.optimizer.variables) != len(optimizer.variables):
+            raise Exception("the optimizer of the copy has different variables")
+    return copy
+
+def optimizerState(model) -> list:
+    """Values of the optimizer's variables (such as iterations and moments), empty if the model has none"""
+    optimizer = getattr(model, 'optimizer', None)
+    if optimizer is None:
+        return []
+    return [variable.numpy() for variable in optimizer.variables]
+
+class ModelSaver:
+    """
+    Saves checkpoints on a background thread. Each job carries a snapshot of the weights and optimizer state,
+    which are loaded into a copy of the model, so training continues while the file is written and can be
+    resumed from it. The result of each save is sent to the dashboard as a Model_Saved message.
+    """
+    def __init__(self, model, updatelist: List[Message], background: bool = True):
+        """
+        :param model: Model that is written, a copy of the training model when background is True
+        :param updatelist: Where results are sent
+        :param background: False saves on the calling thread, for models that can't be copied
+        """
+        self.model = model
+        self.updatelist = updatelist
+        self.background = background
+        self.saved: List[str] = [] #paths of earlier saves, oldest first
+        self.jobs = queue.Queue()
+        if background:
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+
+    def submit(self, snapshot, path: str, keep: int = 0, compress: bool = False):
+        """
+        :param snapshot: Weights and optimizer state of the training model, None when saving it directly
+        """
+        if self.background:
+            self.jobs.put((snapshot, path, keep, compress))
+        else:
+            self.save(None, path, keep, compress)
+
+    def wait(self):
+        """Blocks until every submitted save has been written"""
+        self.jobs.join()
+
+    def run(self):
+        while True:
+            job = self.jobs.get()
+            try:
+                self.save(*job)
+            finally:
+                self.jobs.task_done()
+
+    def save(self, snapshot, path: str, keep: int, compress: bool):
+        starttime = time.time()
+        error = None
+        try:
+            if snapshot is not None:
+                weights, state = snapshot
+                self.model.set_weights(weights)
+                for variable, value in zip(self.model.optimizer.variables if len(state) > 0 else [], state):
+                    variable.assign(value)
+            self.model.save(path)
+            if compress:
+                with open(path, 'rb') as source, gzip.open(path + '.gz', 'wb') as target:
+                    shutil.copyfileobj(source, target)
+                os.remove(path)
+                path += '.gz'
+            self.rotate(path, keep)
+        except Exception as e:
+            error = str(e)
+            warnings.warn("Model could not be saved: " + error)
+        self.updatelist.append(Message(MessageMode.Model_Saved, {'path': path, 'duration': time.time() - starttime,
+                                                                 'error': error}))
+
+    def rotate(self, path: str, keep: int):
+        """Deletes the oldest saves so only keep are left (0 keeps all)"""
+        if path in self.saved:
+            self.saved.remove(path)
+        self.saved.append(path)
+        while keep > 0 and len(self.saved) > keep:
+            oldest = self.saved.pop(0)
+            if os.path.exists(oldest):
+                os.remove(oldest)
+
 #region Callbacks
 class DashboardCallbacks(Callback):
     def __init__(self, updatelist: List[Message], returnlist: List[Message], model, x_train, y_train, x_test, y_test,
@@ -39,9 +330,10 @@ class DashboardCallbacks(Callback):
         :param updatelist: List from dashboard creation
         :param returnlist: List from dashboard creation
         :param model: Tensorflow model (this is no longer needed in tf 2.16)
-        :param x_train: Training set features
+        :param x_train: Training set features. Can also be a path to a .npy file, a tf.data.Dataset, a generator,
+        a random access dataset or a DataSource, in which case y_train is None (or a .npy path).
         :param y_train: Training set output
-        :param x_test: Test set features
+        :param x_test: Test set features, same options as x_train
         :param y_test: Test set output
         :param prediction_labels: Allows images to be labeled with friendly text
         :param config: Customize when data is sent
@@ -50,14 +342,25 @@ class DashboardCallbacks(Callback):
         super().__init__()
         self.updatelist = updatelist
         self.returnlist = returnlist
+        self.imagearena = getattr(updatelist, 'imagearena', None) #image samples sent through shared memory
         self.x_train = x_train
         self.y_train = y_train
         self.x_test = x_test
         self.y_test = y_test
+        #rows are only read when a module asks for them
+        self.sources = {'train': createDataSource(x_train, y_train), 'test': createDataSource(x_test, y_test)}
 
         self.predictionlabels = prediction_labels
 
         self.config = config
+        self.predictioncache = {dataset: PredictionCache(source) for dataset, source in self.sources.items()}
+        self.weightschanged = False #set by training batches, clears the prediction cache next epoch
+        self.inferencemodel = None #copy of the model used by the prediction worker
+        self.worker = None
+        self.saver = None
+        self.epoch = 0 #last epoch that ended
+        self.requesttime = 0.0 #seconds the training thread spent on data requests
+        self.trainstep = 0 #training batches since training started, batch numbers restart every epoch
 
         self.handleDataRequest()
 
@@ -73,107 +376,164 @@ class DashboardCallbacks(Callback):
             labels.append(self.predictionlabels[np.argmax(item)])
         return labels
 
-    def sample(self, data, x, y):
+    def share(self, source: DataSource, rows: np.ndarray):
+        """
+        Reads rows and writes the features into the shared image arena if there is one.
+        Otherwise the rows are sent directly. Returns the features and labels.
+        """
+        return source.take(rows, self.imagearena)
+
+    def sample(self, data, dataset='train'):
+        source = self.sources[dataset]
         start = data.body["startingindex"]
-        num = data.body["num"] + start
-        x = x[start:num]
-        y = y[start:num]
+        x, y = self.share(source, source.rowRange(start, start + data.body["num"]))
         return {"x": x, "y": self.label(y)}
 
-    def predsample(self, data, x, y):
+    def predictRows(self, rows: np.ndarray, dataset='test') -> np.ndarray:
+        """Returns the predicted class of each row, only predicting rows that are not in the cache"""
+        cache = self.predictioncache[dataset]
+        model = self.model if self.inferencemodel is None else self.inferencemodel
+        unscored = cache.unscored(rows)
+        if len(unscored) > 0:
+            x = self.sources[dataset].read(unscored)[0]
+            cache.score(unscored, np.argmax(model.predict(x, verbose=0), axis=-1))
+        return cache.preds[rows]
+
+    def predsample(self, data, dataset='test'):
+        source = self.sources[dataset]
         start = data.body["startingindex"]
-        num = data.body["num"] + start
-        pred = self.predlabel(self.model.predict(x[start:num]))
-        x = x[start:num]
-        y = y[start:num]
+        rows = source.rowRange(start, start + data.body["num"])
+        pred = self.label(self.predictRows(rows, dataset))
+        x, y = self.share(source, rows)
         return {'x': x, 'y': self.label(y), 'pred': pred}
 
-    def wrongpredsample(self, data, x, y):
+    def wrongpredsample(self, data, dataset='test'):
         maxnum = data.body["num"]
-        attempts = data.body["attempts"]
-
-        preds = self.predlabel(self.model.predict(x[0:attempts]))
-        y = self.label(y)
-        features = []
-        wrongpreds = []
-        correctresult = []
-        for i in range(0, attempts):
-            if preds[i] != y[i]:
-                features.append(x[i])
-                wrongpreds.append(preds[i])
-                correctresult.append(y[i])
-
-            if len(features) >= maxnum:
-                break
-        return {'x': features, 'y': correctresult, 'pred': wrongpreds}
+        source = self.sources[dataset]
+        cache = self.predictioncache[dataset]
+
+        rows = cache.nextRows(data.body["attempts"])
+        preds = self.predictRows(rows, dataset)
+        wrong = rows[preds != np.asarray(source.labels(rows))][:maxnum]
+        if 0 < len(wrong) == maxnum: #continue after the last example shown
+            cache.advance(int(wrong[-1]))
+        elif len(rows) > 0:
+            cache.advance(int(rows[-1]))
+        x, y = self.share(source, wrong)
+        return {'x': x, 'y': self.label(y), 'pred': self.label(cache.preds[wrong])}
+
+    def prefetchPredictions(self, requests: List[Message]):
+        """Predicts every row needed by these requests with one predict call per dataset"""
+        rows = {'train': [], 'test': []}
+        for item in requests:
+            dataset = 'train' if item.mode in [MessageMode.Pred_Sample_Train,
+                                               MessageMode.Wrong_Pred_Sample_Train] else 'test'
+            if item.mode in [MessageMode.Pred_Sample, MessageMode.Pred_Sample_Train]:
+                start = item.body["startingindex"]
+                rows[dataset].append(self.sources[dataset].rowRange(start, start + item.body["num"]))
+            elif item.mode in [MessageMode.Wrong_Pred_Sample, MessageMode.Wrong_Pred_Sample_Train]:
+                rows[dataset].append(self.predictioncache[dataset].nextRows(item.body["attempts"]))
+
+        for dataset in ['train', 'test']:
+            if len(rows[dataset]) > 0:
+                self.predictRows(np.unique(np.concatenate(rows[dataset])), dataset)
+
+    def startWorker(self) -> bool:
+        """Creates the prediction worker. Returns False if the model can't be copied."""
+        try:
+            self.inferencemodel = clone_model(self.model)
+        except Exception as e:
+            warnings.warn("Model could not be copied, data requests will be handled during training: " + str(e))
+            self.config.async_data_requests = False
+            return False
+        self.worker = PredictionWorker(self, self.inferencemodel)
+        return True
+
+    def saveModel(self, command: dict):
+        """
+        Starts saving the model to the filename in a save command, which can use {epoch}, {step} and {time}.
+        Writing happens on a background thread when the model can be copied.
+        """
+        path = command.get('filename', 'model_epoch{epoch}.keras').format(
+            epoch=self.epoch, step=self.trainstep, time=time.strftime('%Y%m%d-%H%M%S'))
+        if self.saver is None:
+            try:
+                self.saver = ModelSaver(copyModel(self.model), self.updatelist)
+            except Exception as e:
+                warnings.warn("Model could not be copied, it will be saved during training: " + str(e))
+                self.saver = ModelSaver(self.model, self.updatelist, background=False)
+        print("Saving model to " + path)
+        snapshot = (self.model.get_weights(), optimizerState(self.model)) if self.saver.background else None
+        self.saver.submit(snapshot, path, command.get('keep', 0), command.get('compress', False))
 
     # on epoch begin
     def handleDataRequest(self):
-        rmlist = []
-        for index, item in enumerate(self.returnlist):
+        starttime = time.time()
+        requests = takeMessages(self.returnlist, dataRequestModes)
+        if len(requests) > 0:
+            invalidate = self.weightschanged
+            self.weightschanged = False
+            if (self.config.async_data_requests and self.model is not None and
+                    (self.worker is not None or self.startWorker())):
+                self.worker.submit(self.model.get_weights(), requests, invalidate)
+            else:
+                self.serveDataRequests(requests, invalidate)
+        self.requesttime += time.time() - starttime
+
+    def serveDataRequests(self, requests: List[Message], invalidate=False):
+        """Sends the data for each request to the dashboard"""
+        if invalidate:
+            for cache in self.predictioncache.values():
+                cache.invalidate()
+        self.prefetchPredictions(requests)
+        for item in requests:
             if item.mode == MessageMode.Train_Set_Sample:
-                rmlist.append(index)
                 self.updatelist.append(Message(MessageMode.Train_Set_Sample,
-                                               self.sample(item, self.x_train, self.y_train)))
+                                               self.sample(item, 'train')))
 
             elif item.mode == MessageMode.Test_Set_Sample:
-                rmlist.append(index)
                 self.updatelist.append(Message(MessageMode.Test_Set_Sample,
-                                               self.sample(item, self.x_test, self.y_test)))
+                                               self.sample(item, 'test')))
 
             elif item.mode == MessageMode.Pred_Sample:
-                rmlist.append(index)
                 self.updatelist.append(Message(MessageMode.Pred_Sample,
-                                               self.predsample(item, self.x_test, self.y_test)))
-
+                                               self.predsample(item, 'test')))
 
             elif item.mode == MessageMode.Pred_Sample_Train:
-                rmlist.append(index)
                 self.updatelist.append(Message(MessageMode.Pred_Sample_Train,
-                                               self.predsample(item, self.x_train, self.y_train)))
+                                               self.predsample(item, 'train')))
 
             elif item.mode == MessageMode.Wrong_Pred_Sample:
-                rmlist.append(index)
                 self.updatelist.append(Message(MessageMode.Wrong_Pred_Sample,
-                                               self.wrongpredsample(item, self.x_test, self.y_test)))
+                                               self.wrongpredsample(item, 'test')))
 
             elif item.mode == MessageMode.Wrong_Pred_Sample_Train:
-                rmlist.append(index)
                 self.updatelist.append(Message(MessageMode.Wrong_Pred_Sample_Train,
-                                               self.wrongpredsample(item, self.x_train, self.y_train)))
-
-        rmlist.reverse()
-        for index in rmlist:
-            self.returnlist.pop(index)
+                                               self.wrongpredsample(item, 'train')))
 
     # on epoch end
     def handleCommands(self, allowstop=True):
-        rmlist: List[int] = []
-        for index, item in enumerate(self.returnlist):
-            if item.mode == MessageMode.Command:
-                rmlist.append(index)
-                if item.body['command'] == 'stop':
-                    if allowstop:
-                        print("Training manually stopped.")
-                        self.model.stop_training = True
-                    else:
-                        warnings.warn("Stop was triggered but training has already exited.")
-                elif item.body['command'] == 'save':
-                    print("Model manually saved.")
-                    self.model.save(input("File name: "))
-
-        rmlist.reverse()
-        for index in rmlist:
-            self.returnlist.pop(index)
+        for item in takeMessages(self.returnlist, [MessageMode.Command]):
+            if item.body['command'] == 'stop':
+                if allowstop:
+                    print("Training manually stopped.")
+                    self.model.stop_training = True
+                else:
+                    warnings.warn("Stop was triggered but training has already exited.")
+            elif item.body['command'] == 'save':
+                self.saveModel(item.body)
 
     def HandleRemaingCommands(self):  # TODO - handle remaining data requests
         """
         This should be called after the dashboard exits.
         """
         self.handleCommands(allowstop=False)
-        if len(self.returnlist) > 0:
+        if self.saver is not None:
+            self.saver.wait()
+        remaining = takeMessages(self.returnlist)
+        if len(remaining) > 0:
             warnings.warn("We couldn't handle these remaining requests: ")
-        for req in self.returnlist:
+        for req in remaining:
             print(req)
 
     #region callbacks
@@ -183,8 +543,14 @@ class DashboardCallbacks(Callback):
         self.custom_on_train_begin(logs)
 
     def on_train_end(self, logs=None):
+        if self.worker is not None:
+            self.worker.wait() #send pending samples before the training end message
+        if self.saver is not None:
+            self.saver.wait() #the thread stops when the program exits
         if self.config.send_on_train_end:
             self.updatelist.append(Message(MessageMode.Train_End, logs))
+        if self.config.flush_timeout > 0 and hasattr(self.updatelist, 'flush'): #socket transport
+            self.updatelist.flush(self.config.flush_timeout)
         self.custom_on_train_end(logs)
 
     def on_test_begin(self, logs=None):
@@ -209,6 +575,7 @@ class DashboardCallbacks(Callback):
 
     def on_epoch_begin(self, epoch, logs=None):
         logs['epoch'] = epoch
+        self.epoch = epoch
         self.handleDataRequest()
         self.custom_on_epoch_begin(logs)
 
@@ -236,20 +603,29 @@ class DashboardCallbacks(Callback):
 
     def on_train_batch_end(self, batch, logs=None):
         logs['batch'] = batch
+        logs['step'] = self.trainstep
+        self.trainstep += 1
+        self.weightschanged = True
         if self.config.send_on_batch_end:
-            self.updatelist.append(Message(MessageMode.Train_Batch_End, logs))
+            body = self.config.train_batch_policy.offer(logs, self.updatelist)
+            if body is not None:
+                self.updatelist.append(Message(MessageMode.Train_Batch_End, body))
         self.custom_on_train_batch_end(batch)
 
     def on_test_batch_end(self, batch, logs=None):
         logs['batch'] = batch
-        if self.config.send_on_batch_end:
-            self.updatelist.append(Message(MessageMode.Test_Batch_End, logs))
+        if self.config.send_on_test_batch_end:
+            body = self.config.test_batch_policy.offer(logs, self.updatelist)
+            if body is not None:
+                self.updatelist.append(Message(MessageMode.Test_Batch_End, body))
         self.custom_on_test_batch_end(batch)
 
     def on_predict_batch_end(self, batch, logs=None):
         logs['batch'] = batch
-        if self.config.send_on_batch_end:
-            self.updatelist.append(Message(MessageMode.Predict_Batch_End, logs))
+        if self.config.send_on_predict_batch_end:
+            body = self.config.predict_batch_policy.offer(logs, self.updatelist)
+            if body is not None:
+                self.updatelist.append(Message(MessageMode.Predict_Batch_End, body))
         self.custom_on_predict_batch_end(batch)
     #endregion
     #region custom overrides
@@ -1,12 +1,17 @@
+from enum import IntEnum
+from time import time as currentTime
 import warnings
+import struct
+from typing import Union
 
-class MessageMode:
+class MessageMode(IntEnum):
     #control characters
     Start = 0
     End = 1
     ForceUpdate = 2
     CustomData = 3 #handles status module comm
     Command = 4 #handles data return
+    Model_Saved = 5 #result of a save command
 
     #callback messages
     Train_Begin = 10
@@ -34,17 +39,159 @@ class MessageMode:
     Wrong_Pred_Sample = 34 #from test set
     Wrong_Pred_Sample_Train = 35
 
+modeNames = {mode.value: mode.name for mode in MessageMode} #also holds modes added by registerMode
+
+def registerMode(name: str, value: int) -> int:
+    """
+    Adds a message mode for custom modules and callbacks. Values from 100 up are free to use.
+    Must be called in both processes, for example at the top of the module's file.
+    """
+    if value < 100:
+        raise Exception("Custom mode: " + str(name) + " must have a value of 100 or more.")
+    if modeNames.get(value, name) != name:
+        raise Exception("Mode value: " + str(value) + " is already used by " + modeNames[value] + ".")
+    modeNames[value] = name
+    return value
+
 def getMode(x: int):
-    for y in [a for a in dir(MessageMode) if not a.startswith('__')]:
-        if MessageMode().__getattribute__(y) == x:
-            return y
+    """Returns the name of a mode"""
+    if x in modeNames:
+        return modeNames[x]
     warnings.warn("No valid mode found.")
 
 class Message:
-    def __init__(self, mode: int, body: dict):
-        self.mode = mode
+    __slots__ = ('mode', 'body', 'series', 'worker', 'time')
+
+    def __init__(self, mode: int, body: dict, series: list = None, worker: int = None, time: float = None):
+        """
+        :param mode: MessageMode of the message
+        :param body: Data payload
+        :param series: Bodies of every message that was coalesced into this one, oldest first
+        :param worker: Trainer that sent the message when several share a dashboard over a socket
+        :param time: When the message was created (default: now), used to pace replays of recorded runs
+        """
+        self.mode = int(mode) #plain ints pickle smaller than enum members
         self.body = body
+        self.series = series
+        self.worker = worker
+        self.time = currentTime() if time is None else time
 
     def __repr__(self):
-        return ("Message with mode: " + getMode(self.mode) + " and data payload: " + str(self.body) +
+        return ("Message with mode: " + str(getMode(self.mode)) + " and data payload: " + str(self.body) +
                 " At location: " + object.__repr__(self))
+
+#region Compact Encoding
+class NameTable:
+    """
+    Interned metric names. Each name gets a small id the first time it is seen, so messages only carry the id.
+    Both ends of a transport must share the table.
+    """
+    def __init__(self):
+        self.names = []
+        self.ids = {}
+
+    def intern(self, name: str) -> Union[int, None]:
+        """Returns the id of a name, adding it if needed. None if the table is full."""
+        if name not in self.ids:
+            if len(self.names) >= 2**16:
+                return None
+            self.ids[name] = len(self.names)
+            self.names.append(name)
+        return self.ids[name]
+
+    def lookup(self, nameid: int) -> str:
+        return self.names[nameid]
+
+class MetricsSchema:
+    """
+    Encodes a body of metric names and numbers, with optional 'min' and 'max' dicts of the same form,
+    as name ids followed by float64 values and the message's time. Ints are marked so they decode as ints.
+    The layout for each set of keys is worked out once and reused for every message with the same keys.
+    """
+    HEADER = struct.Struct('<BH') #mode, number of values
+    sections = [None, 'min', 'max']
+
+    def __init__(self):
+        #ids depend on the name table, so layouts are stored for each table
+        self.encoders = {} #(table, mode, keys) -> (prefix with the header, ids and flags, values struct)
+        self.decoders = {} #(table, prefix) -> (values struct, (section, name, isint) for each value)
+
+    def flatten(self, body: dict) -> Union[tuple, None]:
+        """Returns the keys (with their section) and values of a body, or None if it does not fit the schema"""
+        keys, values = [], []
+        for section, part in enumerate([body, body.get('min'), body.get('max')]):
+            if part is None:
+                continue
+            if not isinstance(part, dict):
+                return None
+            for key, value in part.items():
+                if section == 0 and key in ['min', 'max']:
+                    continue
+                if not isinstance(key, str):
+                    return None
+                keys.append((section, key, type(value) is int))
+                values.append(value)
+        return tuple(keys), values
+
+    def encode(self, message: Message, names) -> Union[bytes, None]:
+        """Returns None if the body does not fit the schema"""
+        flat = self.flatten(message.body)
+        if flat is None:
+            return None
+        keys, values = flat
+        plan = self.encoders.get((names, message.mode, keys))
+        if plan is None:
+            ids = [names.intern(key) for _, key, _ in keys]
+            if None in ids:
+                return None
+            flags = [section << 1 | isint for section, _, isint in keys]
+            count = len(keys)
+            prefix = (self.HEADER.pack(message.mode, count) +
+                      struct.pack('<' + str(count) + 'H' + str(count) + 'B', *ids, *flags))
+            plan = (prefix, struct.Struct('<' + str(count + 1) + 'd'))
+            self.encoders[(names, message.mode, keys)] = plan
+        try:
+            #numpy and tensor scalars are converted with __float__
+            return plan[0] + plan[1].pack(*values, message.time)
+        except (struct.error, TypeError):
+            return None
+
+    def decode(self, data: bytes, names) -> Message:
+        mode, count = self.HEADER.unpack_from(data, 0)
+        end = self.HEADER.size + count * 3
+        plan = self.decoders.get((names, data[:end]))
+        if plan is None:
+            fields = struct.unpack_from('<' + str(count) + 'H' + str(count) + 'B', data, self.HEADER.size)
+            keys = [(self.sections[flag >> 1], names.lookup(nameid), flag & 1)
+                    for nameid, flag in zip(fields[:count], fields[count:])]
+            plan = (struct.Struct('<' + str(count + 1) + 'd'), keys)
+            self.decoders[(names, data[:end])] = plan
+
+        body = {}
+        values = plan[0].unpack_from(data, end)
+        for (section, name, isint), value in zip(plan[1], values):
+            target = body if section is None else body.setdefault(section, {})
+            target[name] = int(value) if isint else value
+        return Message(mode, body, time=values[-1])
+
+metricsSchema = MetricsSchema()
+
+#modes that can be sent with a compact encoding, other messages are pickled
+messageSchemas = {MessageMode.Train_Begin: metricsSchema,
+                  MessageMode.Train_End: metricsSchema,
+                  MessageMode.Test_End: metricsSchema,
+                  MessageMode.Epoch_End: metricsSchema,
+                  MessageMode.Train_Batch_End: metricsSchema,
+                  MessageMode.Test_Batch_End: metricsSchema,
+                  MessageMode.ForceUpdate: metricsSchema}
+
+def encodeMessage(message: Message, names) -> Union[bytes, None]:
+    """Encodes a message with the schema of its mode. Returns None if it has to be pickled instead."""
+    schema = messageSchemas.get(message.mode)
+    if schema is None or message.series is not None or not isinstance(message.body, dict):
+        return None
+    return schema.encode(message, names)
+
+def decodeMessage(data: bytes, names) -> Message:
+    return messageSchemas[data[0]].decode(data, names)
+#endregion
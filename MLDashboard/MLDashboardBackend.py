@@ -1,5 +1,6 @@
 #Module imports
 from MLDashboard.DashboardModules.LossMetricsGraph import LossMetricsGraph
+from MLDashboard.DashboardModules.BatchMetricsGraph import BatchMetricsGraph
 from MLDashboard.DashboardModules.LossMetricsNumerical import LossMetricsNumerical
 from MLDashboard.DashboardModules.StatusModule import StatusModule
 from MLDashboard.DashboardModules.ControlButtons import ControlButtons
@@ -9,15 +10,26 @@ from MLDashboard.DashboardModules.WrongPredImages import WrongPredImages
 from MLDashboard.DashboardModules.EmptyModule import EmptyModule
 from MLDashboard.DashboardModules.Module import Module
 
-from MLDashboard.MLCommunicationBackend import Message, MessageMode
+from MLDashboard.MLCommunicationBackend import Message, MessageMode, modeNames
+from MLDashboard.MLTransportBackend import CommandQueue, SocketSender, SocketServer, createUpdateList
+from MLDashboard.MLRenderBackend import FrameSink, createFrameSink, createHeadlessFigure, encodeFrame
+from MLDashboard.MLSeriesBackend import MetricsStore
+from MLDashboard.MLRecorderBackend import MessageRecorder, readLog
+from matplotlib.transforms import Bbox
 import matplotlib.pyplot as pyplot
-from typing import List, Tuple
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Tuple
 import multiprocessing
+import threading
 import json
+import os
+import secrets
 import time
+import warnings
 
 #region Dashboard
 allModules = {'LossMetricsGraph': LossMetricsGraph,
+              'BatchMetricsGraph': BatchMetricsGraph,
               'LossMetricsNumerical': LossMetricsNumerical,
               'StatusModule': StatusModule,
               'ControlButtons': ControlButtons,
@@ -26,46 +38,150 @@ allModules = {'LossMetricsGraph': LossMetricsGraph,
               'WrongPredImages': WrongPredImages,
               'EmptyModule': EmptyModule}
 
-def dashboardProcess(configjson: dict, updatelist: list, returnlist: list, openatend):
+def dashboardProcess(configjson: dict, updatelist: list, returnlist: list, openatend, headless=None, framesink=None):
     """Wrapper function to run dashboard in a seperate process. This should not be called manually."""
     print("Loading dashboard...")
-    dashboard = Dashboard(configjson, updatelist, returnlist, openatend)
+    dashboard = Dashboard(configjson, updatelist, returnlist, openatend, headless, framesink)
     print("Starting dashboard...")
     dashboard.runDashboardLoop()
 
-def createDashboard(config='dashboard.json', waitforstart=True,
-                    openatend=True) -> Tuple[multiprocessing.Process, List[Message], List[Message]]:
+def serveDashboard(configjson: dict, address: str, openatend=True, headless=None, framesink=None,
+                   mergetimeout=30.0, authkey=None, disconnecttimeout=10.0):
+    """
+    Runs a dashboard that trainers connect to over a socket with connectDashboard. Blocks until every
+    trainer has sent End, or every trainer has been disconnected for disconnecttimeout seconds.
+    :param configjson: Dashboard config
+    :param address: 'tcp://host:port' or 'unix:///path/to/socket' to listen on
+    :param mergetimeout: Seconds to wait for slow workers before an epoch is shown without them
+    :param authkey: Key trainers must connect with (default: the MLDASHBOARD_AUTHKEY environment variable,
+    or a random key that is printed)
+    :param disconnecttimeout: Seconds to wait for a trainer to reconnect once none are connected
+    """
+    if authkey is None and not os.environ.get('MLDASHBOARD_AUTHKEY'):
+        authkey = secrets.token_hex(16)
+        print("Dashboard authkey: " + authkey)
+    server = SocketServer(address, mergetimeout, authkey, disconnecttimeout)
+    print("Dashboard listening on " + server.address)
+    try:
+        dashboardProcess(configjson, server, server.returnlist, openatend, headless, framesink)
+    finally:
+        server.close()
+
+def connectDashboard(address: str, worker=0, waitforstart=False, timeout=None,
+                     maxqueue=10000, authkey=None, flushtimeout=0.0) -> Tuple[SocketSender, List[Message]]:
+    """
+    Connects a trainer to a dashboard started with serveDashboard, which may be on another machine.
+    Returns the updatelist and returnlist for DashboardCallbacks. Messages are sent on a background thread,
+    so training continues if the dashboard is slow or not running.
+    :param address: 'tcp://host:port' or 'unix:///path/to/socket' of the dashboard
+    :param worker: Id of this trainer, for example its rank in data parallel training. Ids must be unique.
+    :param waitforstart: Wait for the dashboard to be ready before returning
+    :param timeout: Seconds to wait for the dashboard (None waits forever)
+    :param maxqueue: Messages kept while the dashboard is slow or absent, the oldest are dropped after that
+    :param authkey: Key the dashboard was served with (default: the MLDASHBOARD_AUTHKEY environment variable)
+    :param flushtimeout: Seconds appending End waits for queued messages to be sent, 0 never waits
+    """
+    updatelist = SocketSender(address, worker, maxqueue, authkey=authkey, flushtimeout=flushtimeout)
+    if waitforstart and not updatelist.returnlist.waitForStart(timeout):
+        warnings.warn("Dashboard at " + address + " did not start, messages are queued until it does.")
+    return updatelist, updatelist.returnlist
+
+def createDashboard(config='dashboard.json', waitforstart=True, openatend=True, transport='manager',
+                    buffersize=2**26, fullpolicy='block', imagearenasize=2**27, encoding='pickle', headless=None,
+                    framesink: FrameSink = None,
+                    address='tcp://127.0.0.1:8765') -> Tuple[multiprocessing.Process, List[Message], List[Message]]:
     """
     Creates a dashboard running in a seperate process.
     Returns the process, updatelist, and return list for communication
     :param config: The file to load the dashboard config from
     :param waitforstart: Should the main process halt while the dashboard starts
     :param openatend: Calls pyplot.show() at end of training
+    :param transport: How updates are sent to the dashboard: 'manager', 'sharedmemory' (ring buffer) or 'socket'
+    :param buffersize: Size in bytes of the shared memory ring buffer
+    :param fullpolicy: What happens when the ring buffer is full: 'block', 'dropoldest' or 'dropnewest'
+    :param imagearenasize: Bytes of shared memory for image samples with the sharedmemory transport (0 to disable)
+    :param encoding: 'pickle', or 'compact' to send metric messages in a smaller binary format (sharedmemory only)
+    :param headless: Render without a window, sending frames to framesink (default: 'headless' in the config json)
+    :param framesink: Where headless frames are sent (default: created from the config json)
+    :param address: Address the dashboard listens on with the socket transport
     """
-    syncmanager = multiprocessing.Manager()
-    updatelist: List[Message] = syncmanager.list()
-    returnlist: List[Message] = syncmanager.list()
+    if transport == 'socket': #same as a remote dashboard, but started here
+        with open(config) as f:
+            configjson = json.load(f)
+        authkey = secrets.token_bytes(32) #only this process and the dashboard know it
+        process = multiprocessing.Process(target=serveDashboard, args=(configjson, address, openatend, headless,
+                                                                       framesink, 30.0, authkey,))
+        process.start()
+        updatelist, returnlist = connectDashboard(address, 0, authkey=authkey)
+        if waitforstart:
+            waitForDashboard(process, returnlist)
+        return process, updatelist, returnlist
+
+    syncmanager = multiprocessing.Manager() if transport == 'manager' else None
+    updatelist: List[Message] = createUpdateList(transport, syncmanager, buffersize, fullpolicy, imagearenasize,
+                                                  encoding)
+    returnlist = CommandQueue()
 
     with open(config) as f:
         configjson = json.load(f)
-    process = multiprocessing.Process(target=dashboardProcess, args=(configjson, updatelist, returnlist, openatend,))
+    process = multiprocessing.Process(target=dashboardProcess, args=(configjson, updatelist, returnlist, openatend,
+                                                                     headless, framesink,))
     process.start()
+    if hasattr(updatelist, 'watch'): #a full ring buffer stops waiting if the dashboard exits
+        updatelist.watch(process)
 
     if waitforstart:
-        done = False
-        rmindex = -1
-        while not done:
-            time.sleep(0.05)
-            for index, item in enumerate(returnlist):
-                if item.mode == MessageMode.Start:
-                    rmindex = index
-                    done = True
-                    break
-
-        returnlist.pop(rmindex)
+        waitForDashboard(process, returnlist)
 
     return process, updatelist, returnlist
 
+def waitForDashboard(process: multiprocessing.Process, returnlist: CommandQueue):
+    """Blocks until the dashboard has started, raising if its process exits first"""
+    while not returnlist.waitForStart(0.5):
+        if not process.is_alive():
+            raise Exception("Dashboard process exited before it started.")
+
+def replayDashboard(log: str, configjson: dict, speed: float = 1.0, openatend=True, headless=None,
+                    framesink=None, run: int = -1) -> float:
+    """
+    Runs a dashboard in this process with the messages recorded in a log (see 'record' in the dashboard config),
+    for reviewing past runs or comparing render performance on the same messages. Returns the seconds it took.
+    :param log: Log file written by a dashboard
+    :param configjson: Dashboard config, does not need to match the one that was recorded
+    :param speed: How many times faster than recorded messages are sent. None sends them as fast as possible.
+    :param openatend: Calls pyplot.show() at the end of the replay
+    :param headless: Render without a window, sending frames to framesink (default: 'headless' in the config json)
+    :param framesink: Where headless frames are sent (default: created from the config json)
+    :param run: Which run in the log to replay, negative counts from the last run (default: the last run)
+    """
+    configjson = dict(configjson)
+    configjson['dashboard'] = {key: value for key, value in configjson.get('dashboard', {}).items()
+                               if key != 'record'} #not recorded again
+    updatelist: List[Message] = []
+    thread = threading.Thread(target=replayLog, args=(log, updatelist, speed, run), daemon=True)
+    dashboard = Dashboard(configjson, updatelist, [], openatend, headless, framesink)
+    starttime = time.time()
+    thread.start()
+    dashboard.runDashboardLoop()
+    return time.time() - starttime
+
+def replayLog(log: str, updatelist: List[Message], speed: float = None, run: int = -1):
+    """Appends the messages of a run in a log to an updatelist with their recorded timing divided by speed"""
+    starttime = time.time()
+    firsttime = None
+    ended = False
+    for recordedtime, message in readLog(log, run):
+        if firsttime is None:
+            firsttime = recordedtime
+        if speed:
+            delay = (recordedtime - firsttime) / speed - (time.time() - starttime)
+            if delay > 0:
+                time.sleep(delay)
+        updatelist.append(message)
+        ended = message.mode == MessageMode.End
+    if not ended: #the recording dashboard was stopped early
+        updatelist.append(Message(MessageMode.End, {}))
+
 def getModules(configjson):
     """Returns a list of module classes"""
 
@@ -89,6 +205,41 @@ def getModules(configjson):
 
     return modules, configs, sublistlen, len(modulelist)
 
+#modes where only the latest message needs to be shown, so runs of them can be merged
+coalescingModes = [MessageMode.Train_Batch_End, MessageMode.Test_Batch_End, MessageMode.Predict_Batch_End]
+
+def drainUpdates(updatelist: List[Message]) -> List[Message]:
+    """Removes and returns every queued message in as few calls as possible"""
+    if hasattr(updatelist, 'drain'):
+        return updatelist.drain()
+    messages = updatelist[:]
+    del updatelist[:len(messages)] #only the dashboard removes items, so new messages are kept
+    return messages
+
+def coalesceMessages(messages: List[Message]) -> Tuple[List[Message], int]:
+    """
+    Merges consecutive messages with the same coalescing mode into the latest one.
+    The merged message keeps the body of every message in series. Returns the messages and the number merged.
+    """
+    output: List[Message] = []
+    merged = 0
+    for message in messages:
+        if (message.mode in coalescingModes and len(output) > 0 and output[-1].mode == message.mode and
+                output[-1].worker == message.worker):
+            previous = output[-1]
+            series = previous.series if previous.series is not None else [previous.body]
+            series.append(message.body)
+            output[-1] = Message(message.mode, message.body, series, message.worker, message.time)
+            merged += 1
+        else:
+            output.append(message)
+    return output, merged
+
+def timedPrepare(module: Module, message: Message) -> tuple:
+    """Runs a module's prepare phase on a worker thread, returning the result and how long it took"""
+    starttime = time.time()
+    return module.prepare(message), time.time() - starttime
+
 def addRequests(reqs, outputlist):
     """Adds requests to output list if reqs is not none"""
     if reqs is not None:
@@ -101,19 +252,37 @@ class Dashboard:
     Dashbaords should be created with the createDashboard function.
     """
     def __init__(self, configjson: dict, updatelist: List[Message], returnlist: List[Message],
-                 openatend:bool = False):
+                 openatend:bool = False, headless:bool = None, framesink: FrameSink = None):
+        """
+        :param configjson: Dashboard config
+        :param updatelist: Messages sent to the dashboard
+        :param returnlist: Messages sent from the dashboard
+        :param openatend: Calls pyplot.show() at end of training
+        :param headless: Render with Agg instead of a window (default: 'headless' in the dashboard config)
+        :param framesink: Receives headless frames (default: created from the dashboard config)
+        """
         self.configjson = configjson
         self.updatelist = updatelist
         self.returnlist = returnlist
+        self.imagearena = getattr(updatelist, 'imagearena', None) #image samples sent through shared memory
         moduleclasslist, moduleconfiglist, self.width, self.height = getModules(configjson)
         self.modulelist: List[Module] = []
 
-
-        self.fig = pyplot.figure()
-        figManager = pyplot.get_current_fig_manager()
-        figManager.window.state('zoomed')
+        dashboardconfig = self.configjson.get('dashboard', {})
+        self.store = MetricsStore(**dashboardconfig.get('retention', {})) #metrics shared by every module
+        self.laststep = None #step of the last batch in the store, series need increasing x
+        self.recorder = MessageRecorder(dashboardconfig['record']) if 'record' in dashboardconfig else None
+        self.headless = dashboardconfig.get('headless', False) if headless is None else headless
+        if self.headless:
+            self.fig = createHeadlessFigure()
+            self.framesink = createFrameSink(dashboardconfig) if framesink is None else framesink
+        else:
+            self.fig = pyplot.figure()
+            figManager = pyplot.get_current_fig_manager()
+            figManager.window.state('zoomed')
+            self.fig.canvas.manager.set_window_title("Tensorflow Dashboard")
+            self.framesink = None
         self.fig.suptitle("Tensorflow Dashboard")
-        self.fig.canvas.manager.set_window_title("Tensorflow Dashboard")
         self.fig.set_tight_layout(True)
         for i, module in enumerate(moduleclasslist):
             ax = self.fig.add_subplot(self.height, self.width, i+1)
@@ -123,6 +292,7 @@ class Dashboard:
                     if key not in c:
                         c[key] = value
             m = module(ax, c)
+            m.store = self.store
             addRequests(m.initialRequests(), self.returnlist)
             self.modulelist.append(m)
 
@@ -130,58 +300,242 @@ class Dashboard:
         self.currentmode = "Live Render"  # are we rendering during training
         self.timer = 0  # time to do a full update loop
         self.modulestimer = [0.0] * len(self.modulelist) #how long does it take to render each module
+        self.backlog = 0 #messages waiting to be handled
+        self.coalesced = 0 #messages merged by the scheduler
         self.openatend = openatend
 
+        # scheduling
+        self.frameinterval = dashboardconfig.get('frameinterval', 0.05) #minimum seconds between renders
+        if 'fps' in dashboardconfig:
+            self.frameinterval = 1 / dashboardconfig['fps']
+        self.lastrender = 0
+        self.rendertimer = 0.0 #time to draw the last frame
+
+        # routing: messages are only sent to the modules that handle their mode
+        self.routes = {}
+        for mode in modeNames:
+            self.subscribers(mode)
+        self.pollers = [module for module in self.modulelist if type(module).poll is not Module.poll]
+
+        # modules with a prepare phase run it on worker threads, commits stay on this thread
+        self.preparers = {i for i, module in enumerate(self.modulelist) if type(module).prepare is not Module.prepare}
+        workers = dashboardconfig.get('workers', min(4, (os.cpu_count() or 1) - 1)) #0 prepares on this thread
+        self.pool = ThreadPoolExecutor(workers) if workers > 0 and len(self.preparers) > 0 else None
+
+        # blitting: modules with only animated artist changes are redrawn on top of a cached background
+        self.blit = dashboardconfig.get('blit', True)
+        self.backgrounds = [None] * len(self.modulelist)
+        self.blitregions: List[Bbox] = [None] * len(self.modulelist)
+        if self.blit:
+            self.fig.canvas.mpl_connect('draw_event', self.onDraw)
+
     def runDashboardLoop(self): #this function is designed to be run in a separate process
         """Continually updates modules"""
         done = False
         self.returnlist.append(Message(MessageMode.Start, {}))
         while not done:
-            while len(self.updatelist) == 0:
-                pyplot.draw()
-                pyplot.pause(0.001) #only update when resting
+            received = drainUpdates(self.updatelist)
+            if len(received) == 0:
+                self.pollModules()
+                self.render() #only update when resting
+                continue
 
-            mostrecentupdate = self.updatelist.pop(0)
-            if mostrecentupdate.mode == MessageMode.ForceUpdate:
-                pyplot.draw()
-                pyplot.pause(0.001)
-
-            else:
-                starttime = time.time()
-                for i, module in enumerate(self.modulelist):
-                    sTime = time.time()
-                    self.updateModule(module, mostrecentupdate)
-                    self.modulestimer[i] = round(time.time() - sTime, 3)
-                self.timer = round(time.time() - starttime, 3)
+            messages, merged = coalesceMessages(received)
+            self.coalesced += merged
+            prepared = self.prepareMessages(messages)
+            if self.recorder is not None: #each message as it was sent, with shared images resolved by prepare
+                self.recorder.record(received)
+            forcerender = False
+            for index, mostrecentupdate in enumerate(messages):
+                self.backlog = len(messages) - index
+                if mostrecentupdate.mode == MessageMode.ForceUpdate:
+                    forcerender = True
+                else:
+                    self.processMessage(mostrecentupdate, *prepared[index])
 
+                if mostrecentupdate.mode == MessageMode.End:
+                    done = True
+                    break
 
-            if mostrecentupdate.mode == MessageMode.End:
-                done = True
+            self.updateStatus()
+            self.pollModules()
+            self.render(force=forcerender)
 
         print("Dashboard exiting cleanly...")
+        if self.recorder is not None:
+            self.recorder.close()
         self.currentmode = 'Post Training View'
+        self.updateStatus()
         for module in self.modulelist:
-            self.updateModule(module, Message(MessageMode.End, {}))
+            if type(module) != StatusModule:
+                self.updateModule(module, Message(MessageMode.End, {}))
 
-        if self.openatend:
+        if self.headless:
+            self.render(force=True)
+            self.framesink.close()
+        elif self.openatend:
             pyplot.show()
+        if self.pool is not None:
+            self.pool.shutdown()
         for module in self.modulelist:
             req = module.update(Message(MessageMode.End, {}))
             if req is not None:
                 for item in req:
                     self.returnlist.append(item)
+        self.pollModules()
+
+    def subscribers(self, mode: int) -> List[int]:
+        """Indices of the modules that handle a mode"""
+        if mode not in self.routes:
+            self.routes[mode] = [i for i, module in enumerate(self.modulelist)
+                                 if module.modes is None or mode in module.modes]
+        return self.routes[mode]
+
+    def prepareMessages(self, messages: List[Message]) -> List[tuple]:
+        """
+        Starts the prepare phase of every subscribed module for a group of messages on the worker threads,
+        so modules work on different messages at the same time.
+        Returns the shared image references and prepare futures (by module index) of each message.
+        """
+        prepared = []
+        for message in messages:
+            refs = [] if self.imagearena is None else self.imagearena.resolve(message)
+            futures = {}
+            if self.pool is not None:
+                for i in self.subscribers(message.mode):
+                    if i in self.preparers:
+                        futures[i] = self.pool.submit(timedPrepare, self.modulelist[i], message)
+            prepared.append((refs, futures))
+        return prepared
+
+    def processMessage(self, mostrecentupdate: Message, refs: List = None, futures: Dict[int, Future] = None):
+        """Sends a message to the modules that handle its mode"""
+        if refs is None:
+            refs = [] if self.imagearena is None else self.imagearena.resolve(mostrecentupdate)
+        starttime = time.time()
+        self.recordMetrics(mostrecentupdate)
+        for i in self.subscribers(mostrecentupdate.mode):
+            module = self.modulelist[i]
+            sTime = time.time()
+            preparetime = self.updateModule(module, mostrecentupdate, None if futures is None else futures.get(i))
+            self.modulestimer[i] = round(time.time() - sTime + preparetime, 3)
+        self.timer = round(time.time() - starttime, 3)
+        if self.imagearena is not None:
+            self.imagearena.release(refs) #modules must not keep views into the arena
 
-    def updateModule(self, module, mostrecentupdate: Message):
-        if type(module) == StatusModule:
-            reqs = module.update(Message(MessageMode.CustomData, {'autorendering': len(self.updatelist) <= 1,
-                                                                  'currentmode': self.currentmode,
-                                                                  'timer': self.timer,
-                                                                  'modulestimer': self.modulestimer,
-                                                                  'width': self.width,
-                                                                  'height': self.height}))
+    def recordMetrics(self, message: Message):
+        """Adds epoch and training batch metrics to the store before modules are updated"""
+        if message.mode == MessageMode.Epoch_End:
+            self.store.record('epoch', message.body)
+        elif message.mode == MessageMode.Train_Batch_End:
+            for body in (message.series if message.series is not None else [message.body]):
+                step = body.get('step')
+                if step is not None and self.laststep is not None and step <= self.laststep:
+                    continue #out of order, such as a batch that arrived after its step was merged
+                self.laststep = step if step is not None else self.laststep
+                self.store.record('batch', body, step)
+
+    def render(self, force=False):
+        """Redraws the figure at most once per frame interval, unless forced. Skipped if nothing changed."""
+        if (force or time.time() - self.lastrender >= self.frameinterval) and self.isDirty():
+            starttime = time.time()
+            if not self.blitModules():
+                if self.blit:
+                    for module in self.modulelist:
+                        for artist in module.animatedArtists():
+                            artist.set_animated(True) #leaves them out of the cached background
+                if self.headless:
+                    self.fig.canvas.draw()
+                else:
+                    pyplot.draw()
+            if self.headless:
+                self.framesink.write(encodeFrame(self.fig.canvas, self.framesink.fmt))
+            else:
+                pyplot.pause(0.001)
+            self.rendertimer = round(time.time() - starttime, 3)
+            self.lastrender = time.time()
+        elif self.headless:
+            time.sleep(0.001)
         else:
-            reqs = module.update(mostrecentupdate)
+            self.fig.canvas.start_event_loop(0.001) #keep the window responsive between frames
+
+    def isDirty(self):
+        """True if any part of the figure changed since the last render"""
+        if self.fig.stale:
+            return True
+        return self.blit and any(artist.stale for module in self.modulelist for artist in module.animatedArtists())
+
+    def onDraw(self, event):
+        """After a full redraw, caches the background of each module and draws the animated artists on top"""
+        if event is not None and event.canvas is not self.fig.canvas:
+            return
+        canvas = self.fig.canvas
+        renderer = canvas.get_renderer()
+        for i, module in enumerate(self.modulelist):
+            extents = [artist.get_window_extent(renderer) for artist in module.animatedArtists()]
+            self.blitregions[i] = Bbox.union([module.ax.bbox] + extents).padded(2)
+            self.backgrounds[i] = canvas.copy_from_bbox(self.blitregions[i])
+        for module in self.modulelist:
+            for artist in module.animatedArtists():
+                self.fig.draw_artist(artist)
 
+    def blitModules(self) -> bool:
+        """
+        Redraws only the animated artists of modules that changed, on top of their cached background.
+        Returns False if the whole figure needs to be redrawn instead.
+        """
+        if not self.blit or self.fig.stale or None in self.backgrounds:
+            return False
+
+        canvas = self.fig.canvas
+        renderer = canvas.get_renderer()
+        dirty = []
+        for i, module in enumerate(self.modulelist):
+            artists = module.animatedArtists()
+            if any(artist.stale for artist in artists):
+                region = self.blitregions[i]
+                for artist in artists:
+                    extent = artist.get_window_extent(renderer)
+                    if (extent.x0 < region.x0 or extent.y0 < region.y0 or
+                            extent.x1 > region.x1 or extent.y1 > region.y1):
+                        return False #the artist grew past its cached background
+                dirty.append((i, artists))
+
+        for i, artists in dirty:
+            canvas.restore_region(self.backgrounds[i])
+            for artist in artists:
+                self.fig.draw_artist(artist)
+            canvas.blit(self.blitregions[i])
+        return True
+
+    def updateModule(self, module, mostrecentupdate: Message, future: Future = None) -> float:
+        """Commits a module's update. Returns the time its prepare phase took on a worker thread."""
+        if future is None:
+            prepared, preparetime = module.prepare(mostrecentupdate), 0.0
+        else:
+            prepared, preparetime = future.result()
+        reqs = module.commit(mostrecentupdate, prepared)
         addRequests(reqs, self.returnlist)
+        return preparetime
+
+    def updateStatus(self):
+        """Sends the dashboard's own stats to status modules, once for each group of messages handled"""
+        subscribers = self.subscribers(MessageMode.CustomData)
+        if len(subscribers) == 0:
+            return
+        status = Message(MessageMode.CustomData, {'autorendering': self.backlog <= 1,
+                                                  'currentmode': self.currentmode,
+                                                  'timer': self.timer,
+                                                  'modulestimer': self.modulestimer,
+                                                  'coalesced': self.coalesced,
+                                                  'width': self.width,
+                                                  'height': self.height})
+        for i in subscribers:
+            self.updateModule(self.modulelist[i], status)
+
+    def pollModules(self):
+        """Collects requests from modules that create them on their own, such as button clicks"""
+        for module in self.pollers:
+            addRequests(module.poll(), self.returnlist)
 
 #endregion
\ No newline at end of file
@@ -0,0 +1,296 @@
+from collections import OrderedDict
+from typing import Tuple, Union
+import numpy as np
+import threading
+import warnings
+import queue
+
+#region Data Sources
+class DataSource:
+    """
+    Rows of features and labels that the callbacks read for image requests. Only the rows that are asked for
+    are read, so the dataset never has to fit in memory.
+    """
+    @property
+    def length(self) -> Union[int, None]:
+        """Number of rows, or None if it is not known yet"""
+        return None
+
+    def read(self, indices: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the features and labels of these rows"""
+        raise Exception("read is not implemented for " + type(self).__name__)
+
+    def labels(self, indices: np.ndarray) -> np.ndarray:
+        return self.read(indices)[1]
+
+    def take(self, indices: np.ndarray, arena=None) -> Tuple[object, np.ndarray]:
+        """Reads rows and writes the features into the shared image arena if there is one"""
+        x, y = self.read(indices)
+        return (x if arena is None else arena.store(x)), y
+
+    def rowRange(self, start: int, end: int) -> np.ndarray:
+        """Indices from start to end that exist in the source"""
+        end = self.available(end)
+        return np.arange(start, max(start, end))
+
+    def available(self, end: int) -> int:
+        """Returns end, or the number of rows if the source is shorter"""
+        return end if self.length is None else min(end, self.length)
+
+    def close(self):
+        pass
+
+class ArraySource(DataSource):
+    """Arrays in memory, or memory mapped arrays such as np.load(path, mmap_mode='r')"""
+    def __init__(self, x, y):
+        self.x = x
+        self.y = np.asarray(y) if not isinstance(y, np.ndarray) else y
+
+    @property
+    def length(self) -> int:
+        return len(self.x)
+
+    def read(self, indices: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        return np.take(self.x, indices, axis=0), self.y[indices]
+
+    def labels(self, indices: np.ndarray) -> np.ndarray:
+        return self.y[indices]
+
+    def take(self, indices: np.ndarray, arena=None) -> Tuple[object, np.ndarray]:
+        if arena is None:
+            return self.read(indices)
+        return arena.take(self.x, indices), self.y[indices] #gathered straight into shared memory
+
+class NpySource(ArraySource):
+    def __init__(self, xpath: str, ypath: str):
+        """Memory maps .npy files, so only the rows that are read are loaded from disk"""
+        super().__init__(np.load(xpath, mmap_mode='r'), np.load(ypath, mmap_mode='r'))
+
+class RowCache:
+    """Most recently read rows of a source, keyed by index"""
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.rows = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, index: int):
+        with self.lock:
+            row = self.rows.get(index)
+            if row is not None:
+                self.rows.move_to_end(index)
+            return row
+
+    def put(self, index: int, row: tuple):
+        with self.lock:
+            self.rows[index] = row
+            self.rows.move_to_end(index)
+            while len(self.rows) > self.capacity:
+                self.rows.popitem(last=False)
+
+def stackRows(rows: list) -> Tuple[np.ndarray, np.ndarray]:
+    if len(rows) == 0:
+        return np.zeros((0,)), np.zeros((0,), dtype=np.int64)
+    return np.stack([row[0] for row in rows]), np.asarray([row[1] for row in rows])
+
+def rowPair(element) -> tuple:
+    """Features and label of one dataset element. Extra entries such as sample weights are ignored."""
+    if isinstance(element, dict):
+        values = list(element.values())
+        return np.asarray(values[0]), np.asarray(values[1])
+    return np.asarray(element[0]), np.asarray(element[1])
+
+class RandomAccessSource(DataSource):
+    def __init__(self, dataset, cachesize: int = 1024, prefetch: int = 64):
+        """
+        Any object where dataset[i] returns (x, y) and len(dataset) is the number of rows.
+        After each read the rows that follow are loaded on a background thread, since requests usually
+        continue where the last one stopped.
+
+        :param dataset: Object with __getitem__ and __len__
+        :param cachesize: Number of rows kept after they are read
+        :param prefetch: Number of rows loaded ahead of the last read, 0 to turn prefetching off
+        """
+        self.dataset = dataset
+        self.cache = RowCache(cachesize)
+        self.prefetch = prefetch
+        self.pending = queue.Queue(maxsize=1)
+        self.thread = None
+
+    @property
+    def length(self) -> int:
+        return len(self.dataset)
+
+    def row(self, index: int) -> tuple:
+        row = self.cache.get(index)
+        if row is None:
+            row = rowPair(self.dataset[index])
+            self.cache.put(index, row)
+        return row
+
+    def read(self, indices: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        rows = [self.row(int(index)) for index in indices]
+        if self.prefetch > 0 and len(indices) > 0:
+            self.schedule(int(np.max(indices)) + 1)
+        return stackRows(rows)
+
+    def schedule(self, start: int):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+        try:
+            self.pending.put_nowait(start)
+        except queue.Full: #already loading ahead
+            pass
+
+    def run(self):
+        while True:
+            start = self.pending.get()
+            try:
+                for index in range(start, min(start + self.prefetch, self.length)):
+                    self.row(index)
+            except Exception as e:
+                warnings.warn("Rows could not be prefetched: " + str(e))
+
+class StreamSource(DataSource):
+    def __init__(self, stream, batched: bool = None, length: int = None, window: int = 4096, prefetch: int = 256):
+        """
+        Rows read in order from a tf.data.Dataset, a generator, or any iterable. Index i is the i-th row of the
+        stream. A background thread reads up to prefetch rows ahead, and the last window rows are kept so
+        requests can look back. Older rows restart the stream when it can be iterated again
+        (tf.data datasets, lists, or a function that returns a new generator), otherwise they can't be read.
+
+        :param stream: Iterable of (x, y) elements, or a function returning one
+        :param batched: Whether each element is a batch of rows. Detected for tf.data, defaults to True otherwise
+        :param length: Number of rows if known. Found from tf.data cardinality or when the stream ends.
+        :param window: Number of rows kept after they are read
+        :param prefetch: Number of rows read ahead on the background thread
+        """
+        self.stream = stream
+        self.restartable = callable(stream) or hasattr(stream, 'element_spec') or iter(stream) is not stream
+        if batched is None:
+            batched = self.detectBatched(stream)
+        self.batched = batched
+        self.rowcount = length if length is not None else self.cardinality(stream)
+        self.cache = RowCache(window)
+        self.prefetch = prefetch
+        self.lock = threading.Lock()
+        self.reader = None
+        self.position = 0 #index of the next row the reader returns
+
+    @staticmethod
+    def detectBatched(stream) -> bool:
+        if hasattr(stream, 'element_spec'): #tf.data: batched datasets have an unknown leading dimension
+            spec = stream.element_spec
+            spec = list(spec.values())[0] if isinstance(spec, dict) else spec[0]
+            return len(spec.shape) > 0 and spec.shape[0] is None
+        return True #generators for model.fit yield batches
+
+    def cardinality(self, stream) -> Union[int, None]:
+        if not hasattr(stream, 'cardinality') or self.batched:
+            return None #batches may be partial, the row count is found when the stream ends
+        count = int(stream.cardinality())
+        return count if count >= 0 else None
+
+    @property
+    def length(self) -> Union[int, None]:
+        return self.rowcount
+
+    def open(self):
+        """Starts reading the stream from the beginning on a background thread"""
+        if self.reader is not None:
+            if not self.restartable:
+                raise Exception("Stream can't be read again, pass a function that returns a new generator instead")
+            self.reader[1].set()
+        rows = queue.Queue(maxsize=self.prefetch)
+        stop = threading.Event()
+        thread = threading.Thread(target=self.run, args=(rows, stop), daemon=True)
+        self.reader = (rows, stop, thread)
+        self.position = 0
+        thread.start()
+
+    @staticmethod
+    def offer(rows: queue.Queue, stop: threading.Event, row) -> bool:
+        """Waits for room in the queue. Returns False if the reader was stopped."""
+        while not stop.is_set():
+            try:
+                rows.put(row, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def run(self, rows: queue.Queue, stop: threading.Event):
+        try:
+            stream = self.stream() if callable(self.stream) else self.stream
+            if hasattr(stream, 'as_numpy_iterator'):
+                stream = stream.as_numpy_iterator()
+            for element in stream:
+                x, y = rowPair(element)
+                for row in (zip(x, y) if self.batched else [(x, y)]):
+                    if not self.offer(rows, stop, row):
+                        return
+        except Exception as e:
+            warnings.warn("Stream could not be read: " + str(e))
+        self.offer(rows, stop, None) #end of the stream
+
+    def advance(self, end: int):
+        """Reads rows from the stream until row end - 1 is cached or the stream ends"""
+        if self.reader is None:
+            self.open()
+        while self.position < end:
+            row = self.reader[0].get()
+            if row is None:
+                self.rowcount = self.position
+                self.reader[0].put(None) #stays at the end until restarted
+                return
+            self.cache.put(self.position, row)
+            self.position += 1
+
+    def available(self, end: int) -> int:
+        with self.lock:
+            if self.rowcount is None:
+                self.advance(end)
+        return super().available(end)
+
+    def read(self, indices: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        rows = []
+        with self.lock:
+            for index in indices:
+                index = int(index)
+                row = self.cache.get(index)
+                if row is None:
+                    if index < self.position: #no longer kept, read again from the start
+                        self.open()
+                    self.advance(index + 1)
+                    row = self.cache.get(index)
+                    if row is None:
+                        raise Exception("Row " + str(index) + " is past the end of the stream")
+                rows.append(row)
+        return stackRows(rows)
+
+    def close(self):
+        if self.reader is not None:
+            self.reader[1].set()
+#endregion
+
+def createDataSource(x, y=None) -> DataSource:
+    """
+    Creates a data source from what was passed to DashboardCallbacks.
+
+    :param x: Features array, path to a .npy file, tf.data.Dataset, generator, random access dataset,
+    function returning a generator, or a DataSource
+    :param y: Labels when x is an array or a path, otherwise None
+    """
+    if isinstance(x, DataSource):
+        return x
+    if isinstance(x, str):
+        if not isinstance(y, str):
+            raise Exception("Labels must also be a .npy path when features are a path")
+        return NpySource(x, y)
+    if y is not None:
+        return ArraySource(x, y)
+    if hasattr(x, 'element_spec') or callable(x) or (hasattr(x, '__iter__') and not hasattr(x, '__getitem__')):
+        return StreamSource(x)
+    if hasattr(x, '__getitem__') and hasattr(x, '__len__'):
+        return RandomAccessSource(x)
+    raise Exception("Data source: " + type(x).__name__ + " not valid.")
@@ -0,0 +1,235 @@
+from MLDashboard.MLCommunicationBackend import Message
+from typing import Dict, Iterator, List, Tuple
+import numpy as np
+import hashlib
+import pickle
+import struct
+import time
+import zlib
+
+LOGMAGIC = b'MLDLOG1\n'
+CHUNK = struct.Struct('<BI') #kind, payload length
+SEGMENT = 1 #a group of messages, with metrics stored as columns
+BLOB = 2 #one image row, written the first time it is seen
+RUN = 3 #start of a dashboard run, each recorder adds one so a log can hold several runs
+RUNHEADER = struct.Struct('<d') #start time
+
+class BlobRef:
+    """Stands in for an image array in a recorded message. Each row is stored once in the log by its digest."""
+    __slots__ = ('digests', 'dtype', 'rowshape')
+
+    def __init__(self, digests: List[bytes], dtype: str, rowshape: tuple):
+        self.digests = digests
+        self.dtype = dtype
+        self.rowshape = rowshape
+
+def flattenBody(body) -> Dict[tuple, object]:
+    """
+    Returns the columns of a body made only of numbers, or dicts of numbers one level down
+    (like the min and max of merged batches). Returns None for any other body.
+    """
+    if not isinstance(body, dict):
+        return None
+    columns = {}
+    for key, value in body.items():
+        if isinstance(value, dict):
+            for subkey, subvalue in value.items():
+                if not isNumber(subvalue):
+                    return None
+                columns[(key, subkey)] = subvalue
+        elif isNumber(value):
+            columns[(key,)] = value
+        else:
+            return None
+    return columns
+
+def isNumber(value) -> bool:
+    return isinstance(value, (int, float, np.integer, np.floating)) and not isinstance(value, (bool, np.bool_))
+
+#region Recorder
+class MessageRecorder:
+    """
+    Appends every message the dashboard handles to a binary log that can be replayed with replayDashboard.
+    Messages are written in compressed segments: metric bodies become one column per metric, other bodies are
+    pickled, and image rows are stored once no matter how often they are sent.
+    Each recorder starts a new run in the log, so recording to an existing file keeps the earlier runs.
+    """
+    def __init__(self, path: str, chunksize: int = 1024, flushinterval: float = 5.0, level: int = 6):
+        """
+        :param path: Log file, a new run is added if it exists
+        :param chunksize: Messages in each segment
+        :param flushinterval: Seconds before a partial segment is written, so little is lost if the dashboard dies
+        :param level: zlib compression level
+        """
+        self.path = path
+        self.chunksize = chunksize
+        self.flushinterval = flushinterval
+        self.level = level
+        self.file = open(path, 'ab')
+        if self.file.tell() == 0:
+            self.file.write(LOGMAGIC)
+        self.writeChunk(RUN, RUNHEADER.pack(time.time()))
+        self.blobs = set() #digests written by this recorder
+        self.rows = [] #(time, mode, worker, body) waiting for the next segment
+        self.lastflush = time.time()
+
+    def record(self, messages: List[Message]):
+        """
+        Adds messages with the time they were sent. Coalesced messages are recorded as the messages they merged,
+        at the time of the latest one, so the dashboard should record messages before coalescing them.
+        """
+        for message in messages:
+            for body in (message.series if message.series is not None else [message.body]):
+                self.rows.append((message.time, message.mode, message.worker, self.storeArrays(body)))
+        if len(self.rows) >= self.chunksize or time.time() - self.lastflush >= self.flushinterval:
+            self.flush()
+
+    def storeArrays(self, body):
+        """Writes new image rows to the log and returns the body with BlobRefs in place of the arrays"""
+        if not isinstance(body, dict):
+            return body
+        stored = None
+        for key, value in body.items():
+            if isinstance(value, np.ndarray) and value.ndim >= 2:
+                if stored is None:
+                    stored = dict(body) #the dashboard still uses the original
+                stored[key] = self.storeBlob(value)
+        return body if stored is None else stored
+
+    def storeBlob(self, array: np.ndarray) -> BlobRef:
+        digests = []
+        for row in array:
+            row = np.ascontiguousarray(row)
+            digest = hashlib.blake2b(row, digest_size=16).digest()
+            if digest not in self.blobs:
+                self.blobs.add(digest)
+                self.writeChunk(BLOB, digest + zlib.compress(row, self.level))
+            digests.append(digest)
+        return BlobRef(digests, array.dtype.str, array.shape[1:])
+
+    def writeChunk(self, kind: int, payload: bytes):
+        self.file.write(CHUNK.pack(kind, len(payload)) + payload)
+
+    def flush(self):
+        """Writes the waiting messages as one segment"""
+        self.lastflush = time.time()
+        if len(self.rows) == 0:
+            return
+        count = len(self.rows)
+        segment = {'time': np.array([row[0] for row in self.rows], dtype=np.float64),
+                   'mode': np.array([row[1] for row in self.rows], dtype=np.uint16),
+                   'worker': np.array([-1 if row[2] is None else row[2] for row in self.rows], dtype=np.int32),
+                   'layout': np.full(count, -1, dtype=np.int32), #key order of each metric body, -1 if pickled
+                   'layouts': [], 'names': [], 'columns': [], 'other': {}}
+        layouts = {}
+        names = {}
+        isint = []
+        for index, row in enumerate(self.rows):
+            flat = flattenBody(row[3])
+            if flat is None:
+                segment['other'][index] = row[3]
+                continue
+            keys = tuple(flat)
+            if keys not in layouts:
+                for name in keys:
+                    if name not in names:
+                        names[name] = len(names)
+                        segment['names'].append(name)
+                        segment['columns'].append(np.zeros(count, dtype=np.float64))
+                        isint.append(True)
+                layouts[keys] = len(layouts)
+                segment['layouts'].append([names[name] for name in keys])
+            segment['layout'][index] = layouts[keys]
+            for name, value in flat.items():
+                column = names[name]
+                segment['columns'][column][index] = value
+                isint[column] = isint[column] and isinstance(value, (int, np.integer))
+        for column in range(0, len(isint)): #ints are replayed as ints
+            if isint[column]:
+                segment['columns'][column] = segment['columns'][column].astype(np.int64)
+        self.writeChunk(SEGMENT, zlib.compress(pickle.dumps(segment, protocol=pickle.HIGHEST_PROTOCOL),
+                                               self.level))
+        self.file.flush()
+        self.rows = []
+
+    def close(self):
+        self.flush()
+        self.file.close()
+#endregion
+
+#region Reader
+def readChunks(path: str, kinds: List[int]) -> Iterator[Tuple[int, bytes]]:
+    """Yields the kind and payload of each chunk of the given kinds, seeking past the others"""
+    with open(path, 'rb') as f:
+        if f.read(len(LOGMAGIC)) != LOGMAGIC:
+            raise Exception("File: " + str(path) + " is not a dashboard log.")
+        while True:
+            header = f.read(CHUNK.size)
+            if len(header) < CHUNK.size:
+                return
+            kind, length = CHUNK.unpack(header)
+            if kind not in kinds:
+                f.seek(length, 1)
+                continue
+            payload = f.read(length)
+            if len(payload) < length: #the dashboard stopped while writing
+                return
+            yield kind, payload
+
+def logRuns(path: str) -> List[float]:
+    """Start time of each run recorded in a log, oldest first"""
+    return [RUNHEADER.unpack(payload)[0] for kind, payload in readChunks(path, [RUN])]
+
+def readLog(path: str, run: int = -1) -> Iterator[Tuple[float, Message]]:
+    """
+    Yields the time each message was sent and the message, in order.
+    :param path: Log file
+    :param run: Index of the run to read, negative counts from the last run (default: the last run)
+    """
+    runs = len(logRuns(path))
+    current = -1 if runs > 0 else 0 #logs written before runs were marked hold one run
+    runs = max(runs, 1)
+    if run < 0:
+        run += runs
+    if run < 0 or run >= runs:
+        raise Exception("Log: " + str(path) + " has " + str(runs) + " runs, run " + str(run) + " not valid.")
+    blobs = {} #digest: compressed row
+    for kind, payload in readChunks(path, [RUN, BLOB, SEGMENT]):
+        if kind == RUN:
+            current += 1
+            if current > run:
+                return
+        elif current != run:
+            continue
+        elif kind == BLOB:
+            blobs[payload[:16]] = payload[16:]
+        elif kind == SEGMENT:
+            yield from readSegment(pickle.loads(zlib.decompress(payload)), blobs)
+
+def readSegment(segment: dict, blobs: dict) -> Iterator[Tuple[float, Message]]:
+    for index in range(0, len(segment['time'])):
+        if index in segment['other']:
+            body = segment['other'][index]
+            if isinstance(body, dict):
+                body = {key: (loadBlob(value, blobs) if isinstance(value, BlobRef) else value)
+                        for key, value in body.items()}
+        else:
+            body = {}
+            for column in segment['layouts'][segment['layout'][index]]:
+                name = segment['names'][column]
+                value = segment['columns'][column][index].item()
+                if len(name) == 1:
+                    body[name[0]] = value
+                else:
+                    body.setdefault(name[0], {})[name[1]] = value
+        worker = int(segment['worker'][index])
+        sent = float(segment['time'][index])
+        yield sent, Message(int(segment['mode'][index]), body, worker=None if worker < 0 else worker, time=sent)
+
+def loadBlob(ref: BlobRef, blobs: dict) -> np.ndarray:
+    rows = [np.frombuffer(zlib.decompress(blobs[digest]), dtype=np.dtype(ref.dtype)).reshape(ref.rowshape)
+            for digest in ref.digests]
+    if len(rows) == 0:
+        return np.zeros((0,) + tuple(ref.rowshape), dtype=np.dtype(ref.dtype))
+    return np.stack(rows)
+#endregion
@@ -0,0 +1,83 @@
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from PIL import Image
+from collections import deque
+from typing import Callable
+import io
+import os
+
+frameFormats = {'png': 'PNG', 'webp': 'WEBP'}
+
+def encodeFrame(canvas: FigureCanvasAgg, fmt: str = 'png') -> bytes:
+    """Encodes the current contents of an Agg canvas as an image file"""
+    if fmt not in frameFormats:
+        raise Exception("Frame format: " + str(fmt) + " not valid.")
+    width, height = canvas.get_width_height(physical=True)
+    img = Image.frombuffer('RGBA', (width, height), canvas.buffer_rgba(), 'raw', 'RGBA', 0, 1)
+    output = io.BytesIO()
+    img.save(output, format=frameFormats[fmt])
+    return output.getvalue()
+
+#region Frame Sinks
+class FrameSink:
+    """Receives rendered frames from a headless dashboard"""
+    def __init__(self, fmt: str = 'png'):
+        """
+        :param fmt: Image format of each frame: 'png' or 'webp'
+        """
+        if fmt not in frameFormats:
+            raise Exception("Frame format: " + str(fmt) + " not valid.")
+        self.fmt = fmt
+        self.framecount = 0
+
+    def write(self, frame: bytes):
+        pass
+
+    def close(self):
+        pass
+
+class DirectoryFrameSink(FrameSink):
+    def __init__(self, directory: str, fmt: str = 'png'):
+        """Saves each frame to a numbered file in a directory"""
+        super().__init__(fmt)
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, frame: bytes):
+        with open(os.path.join(self.directory, 'frame_' + str(self.framecount).zfill(6) + '.' + self.fmt), 'wb') as f:
+            f.write(frame)
+        self.framecount += 1
+
+class BufferFrameSink(FrameSink):
+    def __init__(self, maxframes: int = 100, fmt: str = 'png'):
+        """Keeps the most recent frames in memory"""
+        super().__init__(fmt)
+        self.frames = deque(maxlen=maxframes)
+
+    def write(self, frame: bytes):
+        self.frames.append(frame)
+        self.framecount += 1
+
+class CallbackFrameSink(FrameSink):
+    def __init__(self, callback: Callable[[bytes], None], fmt: str = 'png'):
+        """Calls a function with each frame. The function must be picklable to be used with createDashboard."""
+        super().__init__(fmt)
+        self.callback = callback
+
+    def write(self, frame: bytes):
+        self.callback(frame)
+        self.framecount += 1
+#endregion
+
+def createFrameSink(dashboardconfig: dict) -> FrameSink:
+    """Creates a frame sink from the dashboard section of the config json"""
+    fmt = dashboardconfig.get('format', 'png')
+    if 'output' in dashboardconfig:
+        return DirectoryFrameSink(dashboardconfig['output'], fmt)
+    return BufferFrameSink(dashboardconfig.get('bufferframes', 100), fmt)
+
+def createHeadlessFigure() -> Figure:
+    """Creates a figure drawn with Agg that does not need a window"""
+    fig = Figure(figsize=(19.2, 10.8))
+    FigureCanvasAgg(fig)
+    return fig
@@ -0,0 +1,320 @@
+import numpy as np
+from typing import Dict, List, Tuple, Union
+
+#region Series
+class RollingSeries:
+    """
+    Circular buffer that keeps only the most recent points. Each point has several columns
+    (for example x, value, min and max). Appending never allocates, so memory and drawing cost stay bounded.
+    """
+    def __init__(self, capacity: int, columns: int):
+        self.buffer = np.empty((capacity, columns), dtype=np.float64)
+        self.capacity = capacity
+        self.position = 0 #where the next point is written
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def append(self, *values: float):
+        self.buffer[self.position] = values
+        self.position = (self.position + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def ordered(self) -> np.ndarray:
+        """Points from oldest to newest. This is a view unless the points wrap around the end of the buffer."""
+        start = (self.position - self.size) % self.capacity
+        if start + self.size <= self.capacity:
+            return self.buffer[start:start + self.size]
+        return np.concatenate([self.buffer[start:], self.buffer[:self.position]])
+
+    def popOldest(self, count: int) -> np.ndarray:
+        """Removes and returns the oldest count points"""
+        count = min(count, self.size)
+        start = (self.position - self.size) % self.capacity
+        rows = np.take(self.buffer, np.arange(start, start + count) % self.capacity, axis=0)
+        self.size -= count
+        return rows
+#endregion
+
+#region Metrics Store
+def rollup(rows: np.ndarray) -> np.ndarray:
+    """
+    Merges groups of rollup rows (x, mean, min, max, count) into one row each.
+    rows has shape (groups, group size, 5).
+    """
+    counts = rows[:, :, 4]
+    total = counts.sum(axis=1)
+    merged = np.empty((len(rows), 5))
+    merged[:, 0] = (rows[:, :, 0] * counts).sum(axis=1) / total
+    merged[:, 1] = (rows[:, :, 1] * counts).sum(axis=1) / total
+    merged[:, 2] = np.fmin.reduce(rows[:, :, 2], axis=1) #ignores NaN
+    merged[:, 3] = np.fmax.reduce(rows[:, :, 3], axis=1)
+    merged[:, 4] = total
+    return merged
+
+def mergeRow(row: np.ndarray, other) -> np.ndarray:
+    """Merges a rollup row into another in place, like rollup does for a group of two"""
+    count = row[4] + other[4]
+    row[0] = (row[0] * row[4] + other[0] * other[4]) / count
+    row[1] = (row[1] * row[4] + other[1] * other[4]) / count
+    row[2] = np.fmin(row[2], other[2]) #ignores NaN
+    row[3] = np.fmax(row[3], other[3])
+    row[4] = count
+    return row
+
+class TieredSeries:
+    """
+    One metric in a MetricsStore. The newest points are kept at full resolution. Older points are merged
+    factor at a time into rows holding their mean, min and max, and those are merged again into coarser tiers.
+    When the last tier is full, neighbouring rows in it are merged, and rows entering it from then on are merged
+    to the same resolution, so the whole run is kept evenly in bounded memory.
+    """
+    def __init__(self, recent: int = 10000, factor: int = 10, tiers: int = 3):
+        """
+        :param recent: Points kept in each tier
+        :param factor: Points merged into one row of the next tier
+        :param tiers: Number of tiers, including the full resolution one
+        """
+        if recent < factor * 10 or factor < 2 or tiers < 1:
+            raise Exception("Retention needs recent >= factor * 10, factor >= 2 and tiers >= 1.")
+        self.tiers = [RollingSeries(recent, 5) for _ in range(0, tiers)] #columns: x, mean, min, max, count
+        self.factor = factor
+        self.chunk = factor * max(recent // (factor * 10), 1) #points moved at a time, a tenth of a tier
+        self.merge = 1 #rows merged into each row of the last tier, doubles every time it is full
+        self.partial = None #rows entering the last tier merged so far, newer than every row in it
+        self.partialcount = 0 #rows merged into partial
+        self.count = 0 #points appended
+        self.ymin = np.inf
+        self.ymax = -np.inf
+        self.cache = None #last downsampling result
+
+    def __len__(self):
+        return sum(len(tier) for tier in self.tiers) + (self.partial is not None)
+
+    def append(self, x: float, y: float, ymin: float = None, ymax: float = None):
+        """Adds a point. ymin and ymax are the range of values merged into it, if any."""
+        ymin = y if ymin is None else ymin
+        ymax = y if ymax is None else ymax
+        self.add(0, [(x, y, ymin, ymax, 1)])
+        self.count += 1
+        if np.isfinite(ymin):
+            self.ymin = min(self.ymin, ymin)
+        if np.isfinite(ymax):
+            self.ymax = max(self.ymax, ymax)
+
+    def add(self, level: int, rows):
+        """Appends rows to a tier, making room first if it is full"""
+        tier = self.tiers[level]
+        if level == len(self.tiers) - 1 and self.merge > 1: #merged to the resolution of the last tier
+            merged = []
+            for row in rows:
+                self.partial = np.array(row, dtype=np.float64) if self.partial is None else mergeRow(self.partial, row)
+                self.partialcount += 1
+                if self.partialcount == self.merge:
+                    merged.append(self.partial)
+                    self.partial = None
+                    self.partialcount = 0
+            rows = merged
+        for row in rows:
+            if len(tier) == tier.capacity:
+                self.demote(level)
+            tier.append(*row)
+
+    def demote(self, level: int):
+        """Makes room in a full tier by merging its oldest points into the next tier"""
+        tier = self.tiers[level]
+        if level == len(self.tiers) - 1: #last tier: halve its resolution
+            rows = tier.popOldest(tier.size)
+            paired = len(rows) - len(rows) % 2 #an odd newest row is kept as it is, after the merged rows
+            for row in np.concatenate([rollup(rows[:paired].reshape(-1, 2, 5)), rows[paired:]]):
+                tier.append(*row)
+            self.merge *= 2
+            return
+        self.add(level + 1, rollup(tier.popOldest(self.chunk).reshape(-1, self.factor, 5)))
+
+    def query(self, start: float = None, end: float = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Returns x, mean, min and max of the points from start to end, oldest first, at the best kept resolution"""
+        tiers = [tier.ordered() for tier in reversed(self.tiers)]
+        if self.partial is not None:
+            tiers.insert(1, self.partial[None])
+        rows = np.concatenate(tiers)
+        if start is not None or end is not None:
+            low = 0 if start is None else np.searchsorted(rows[:, 0], start, 'left')
+            high = len(rows) if end is None else np.searchsorted(rows[:, 0], end, 'right')
+            rows = rows[low:high]
+        return rows[:, 0], rows[:, 1], rows[:, 2], rows[:, 3]
+
+    def latest(self, count: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """x, mean, min and max of the newest count points, read from the first tier when it has enough"""
+        if count <= len(self.tiers[0]) and (len(self.tiers) > 1 or self.merge == 1):
+            rows = self.tiers[0].ordered()[-count:]
+            return rows[:, 0], rows[:, 1], rows[:, 2], rows[:, 3]
+        return tuple(column[-count:] for column in self.query())
+
+    def downsampled(self, budget: int, method: str = 'lttb') -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the means reduced to about budget points. The downsampled points are reused, with the newest
+        points added on raw, until a tenth of the budget has been added since they were computed.
+        """
+        added = 0 if self.cache is None else self.count - self.cache[1]
+        raw = len(self.tiers) > 1 or self.merge == 1 #the newest points are in the first tier as they were added
+        if (self.cache is None or self.cache[0] != (budget, method) or added > max(budget // 10, 1) or
+                added > len(self.tiers[0]) or not raw):
+            x, y = self.query()[:2]
+            if len(x) > budget:
+                x, y = downsample(x, y, budget, method)
+            self.cache = ((budget, method), self.count, x, y)
+            return x, y
+        _, _, cachedx, cachedy = self.cache
+        if added == 0:
+            return cachedx, cachedy
+        tail = self.tiers[0].ordered()[-added:]
+        return np.concatenate([cachedx, tail[:, 0]]), np.concatenate([cachedy, tail[:, 1]])
+
+    @property
+    def nbytes(self) -> int:
+        return sum(tier.buffer.nbytes for tier in self.tiers) + (0 if self.partial is None else self.partial.nbytes)
+
+class MetricsStore:
+    """
+    Every metric the dashboard has received, kept once in the dashboard process and shared by all modules.
+    Metrics are grouped by where they come from ('epoch' or 'batch') and stored as TieredSeries.
+    """
+    ignored = ['epoch', 'batch', 'step', 'count', 'min', 'max', 'size']
+
+    def __init__(self, recent: int = 10000, factor: int = 10, tiers: int = 3):
+        """
+        :param recent: Points kept at full resolution for each metric, and rows kept in each coarser tier
+        :param factor: Points merged into one row of the next tier
+        :param tiers: Number of tiers
+        """
+        self.retention = (recent, factor, tiers)
+        TieredSeries(*self.retention) #checks the retention settings
+        self.groups: Dict[str, Dict[str, TieredSeries]] = {}
+        self.counts: Dict[str, int] = {} #messages recorded in each group
+
+    def record(self, group: str, body: dict, x: float = None):
+        """
+        Adds every number in a message body. x defaults to the number of bodies recorded in the group so far.
+        Bodies merged by a send policy keep their range in 'min' and 'max'.
+        """
+        self.counts[group] = self.counts.get(group, 0) + 1
+        x = self.counts[group] if x is None else x
+        series = self.groups.setdefault(group, {})
+        mins = body.get('min', {})
+        maxs = body.get('max', {})
+        for key, value in body.items():
+            if key in self.ignored or isinstance(value, (str, bool)):
+                continue
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                continue
+            if key not in series:
+                series[key] = TieredSeries(*self.retention)
+            series[key].append(x, value, mins.get(key), maxs.get(key))
+
+    def names(self, group: str) -> List[str]:
+        """Metric names in a group, in the order they were first seen"""
+        return list(self.groups.get(group, {}))
+
+    def series(self, group: str, name: str) -> Union[TieredSeries, None]:
+        return self.groups.get(group, {}).get(name)
+
+    def query(self, group: str, name: str, start: float = None, end: float = None):
+        """x, mean, min and max of a metric from start to end, see TieredSeries.query"""
+        return self.groups[group][name].query(start, end)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(series.nbytes for group in self.groups.values() for series in group.values())
+#endregion
+
+#region Downsampling
+def minMaxDecimate(x: np.ndarray, y: np.ndarray, buckets: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Keeps the smallest and largest point of each bucket, in order, so spikes are never hidden.
+    The first and last points are always kept so the line spans the same x range.
+    """
+    if len(x) <= buckets * 2 or buckets <= 0:
+        return x, y
+    bucketsize = len(x) // buckets
+    usable = bucketsize * buckets
+    ybuckets = y[:usable].reshape(buckets, bucketsize)
+    offsets = np.arange(0, buckets) * bucketsize
+    mins = np.nanargmin(ybuckets, axis=1) + offsets
+    maxs = np.nanargmax(ybuckets, axis=1) + offsets
+    indices = np.unique(np.concatenate([[0], mins, maxs, np.arange(usable, len(x)), [len(x) - 1]]))
+    return x[indices], y[indices]
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Largest triangle three buckets downsampling. Keeps the shape of a line with threshold points."""
+    if len(x) <= threshold or threshold < 3:
+        return x, y
+    edges = np.linspace(1, len(x) - 1, threshold - 1).astype(np.int64) #threshold - 2 buckets between the ends
+    counts = np.diff(edges)
+    #average of the bucket after each bucket, the last bucket uses the final point
+    nextx = np.append((np.add.reduceat(x[:-1], edges[:-1]) / counts)[1:], x[-1])
+    nexty = np.append((np.add.reduceat(y[:-1], edges[:-1]) / counts)[1:], y[-1])
+
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = len(x) - 1
+    previous = 0
+    for i in range(0, threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        areas = np.abs((x[previous] - nextx[i]) * (y[start:end] - y[previous]) -
+                       (x[previous] - x[start:end]) * (nexty[i] - y[previous]))
+        previous = start + int(areas.argmax())
+        indices[i + 1] = previous
+    return x[indices], y[indices]
+
+downsamplingMethods = {'lttb': lttb, 'minmax': minMaxDecimate}
+
+def downsample(x: np.ndarray, y: np.ndarray, budget: int, method: str = 'lttb') -> Tuple[np.ndarray, np.ndarray]:
+    """Reduces a line to about budget points (usually the width of the axes in pixels)"""
+    if method not in downsamplingMethods:
+        raise Exception("Downsampling method: " + str(method) + " not valid.")
+    if method == 'minmax':
+        budget = budget // 2 #two points per bucket
+    return downsamplingMethods[method](x, y, budget)
+
+def exponentialSmoothing(y: np.ndarray, weight: float) -> np.ndarray:
+    """
+    Exponential moving average of y starting at its first value, where weight is from 0 (raw) to below 1.
+    Computed in blocks with cumsum instead of a Python loop. The blocks are short enough that the powers
+    of weight stay in floating point range.
+    """
+    if weight <= 0 or len(y) == 0:
+        return y
+    output = np.empty(len(y))
+    previous = y[0]
+    block = max(int(600 / -np.log(weight)), 1)
+    for start in range(0, len(y), block):
+        chunk = y[start:start + block]
+        steps = np.arange(1, len(chunk) + 1)
+        #s[t] = weight^(t+1) * (previous + (1 - weight) * sum of weight^-(k+1) * y[k] for k <= t)
+        output[start:start + len(chunk)] = weight ** steps * (previous + (1 - weight) *
+                                                              np.cumsum(chunk * weight ** -steps))
+        previous = output[start + len(chunk) - 1]
+    return output
+
+def expandLimits(current: Tuple[float, float], low: float, high: float, margin: float = 0.1) -> Tuple[float, float]:
+    """
+    Returns new axis limits that contain low and high. The current limits are kept if they already fit,
+    and are padded by margin when they grow, so limits change rarely as a series grows.
+    """
+    if not np.isfinite(low) or not np.isfinite(high):
+        return current
+    if not np.isfinite(current[0]) or not np.isfinite(current[1]): #nothing shown yet
+        pad = (high - low) * margin if high > low else 0.5
+        return low - pad, high + pad
+    if current[0] <= low and high <= current[1]:
+        return current
+    span = max(high, current[1]) - min(low, current[0])
+    pad = span * margin if span > 0 else 0.5
+    newlow = current[0] if low >= current[0] else low - pad
+    newhigh = current[1] if high <= current[1] else high + pad
+    return newlow, newhigh
+#endregion
@@ -0,0 +1,1058 @@
+from MLDashboard.MLCommunicationBackend import Message, MessageMode, encodeMessage, decodeMessage
+from multiprocessing import shared_memory
+from collections import deque
+import multiprocessing
+import numpy as np
+import threading
+import queue
+import warnings
+import weakref
+import atexit
+import pickle
+import socket
+import secrets
+import hmac
+import struct
+import time
+import sys
+import os
+from typing import List, Tuple, Union
+
+#region Shared Image Arena
+ARENAHEADER = struct.Struct('<QQQ') #write position, release position, end of the space of dropped messages
+ARENAALIGNMENT = 64
+
+class SharedArray:
+    """Location of an array stored in a SharedImageArena. Only the position, shape and dtype are pickled."""
+    def __init__(self, position: int, nbytes: int, shape: tuple, dtype: str):
+        self.position = position
+        self.nbytes = nbytes
+        self.shape = shape
+        self.dtype = dtype
+
+    def __repr__(self):
+        return "SharedArray with shape: " + str(self.shape) + " and dtype: " + str(self.dtype)
+
+class SharedImageArena:
+    """
+    Shared memory block that image batches are written into by the callbacks. Messages carry a SharedArray
+    instead of the pixels, and the dashboard maps the data directly with numpy.
+    Space is reused once the dashboard releases a message, in the order messages were sent. Space held by
+    messages a full ring buffer drops is freed once the dashboard has handled the messages sent before them.
+    """
+    def __init__(self, capacity: int = 2**27):
+        """
+        :param capacity: Size of the arena in bytes
+        """
+        self.capacity = capacity
+        self.lock = multiprocessing.Lock()
+        self.shm = shared_memory.SharedMemory(create=True, size=ARENAHEADER.size + capacity)
+        ARENAHEADER.pack_into(self.shm.buf, 0, 0, 0, 0)
+        self._finalizer = weakref.finalize(self, releaseSharedMemory, self.shm, True)
+        self.collectable = 0 #dropped space the consumer frees the next time it collects
+
+    def __getstate__(self):
+        return {'name': self.shm.name, 'capacity': self.capacity, 'lock': self.lock}
+
+    def __setstate__(self, state):
+        self.capacity = state['capacity']
+        self.lock = state['lock']
+        self.shm = attachSharedMemory(state['name'])
+        self._finalizer = weakref.finalize(self, releaseSharedMemory, self.shm, False)
+        self.collectable = 0
+
+    def close(self):
+        """Releases the shared memory. The arena can not be used after this is called."""
+        self._finalizer()
+
+    def allocate(self, shape: tuple, dtype) -> Union[tuple, None]:
+        """
+        Reserves space for an array.
+        Returns the SharedArray and a writable view, or None if the arena is full.
+        """
+        dtype = np.dtype(dtype)
+        nbytes = int(np.prod(shape)) * dtype.itemsize
+        size = -(-max(nbytes, 1) // ARENAALIGNMENT) * ARENAALIGNMENT
+        if size > self.capacity:
+            return None
+
+        with self.lock:
+            writepos, releasepos, droppedend = ARENAHEADER.unpack_from(self.shm.buf, 0)
+            if writepos % self.capacity + size > self.capacity: #arrays are never split across the end
+                writepos += self.capacity - writepos % self.capacity
+            if writepos + size - releasepos > self.capacity:
+                return None
+            ARENAHEADER.pack_into(self.shm.buf, 0, writepos + size, releasepos, droppedend)
+
+        ref = SharedArray(writepos, size, tuple(shape), dtype.str)
+        return ref, self.view(ref)
+
+    def store(self, array: np.ndarray) -> Union[SharedArray, np.ndarray]:
+        """Copies an array into the arena. If there is no room the array is returned so it can be sent normally."""
+        array = np.asarray(array)
+        allocation = self.allocate(array.shape, array.dtype)
+        if allocation is None:
+            return array
+        ref, view = allocation
+        view[...] = array
+        return ref
+
+    def take(self, array: np.ndarray, indices: np.ndarray) -> Union[SharedArray, np.ndarray]:
+        """Gathers rows of an array directly into the arena"""
+        allocation = self.allocate((len(indices),) + array.shape[1:], array.dtype)
+        if allocation is None:
+            return array[indices]
+        ref, view = allocation
+        np.take(array, indices, axis=0, out=view)
+        return ref
+
+    def view(self, ref: SharedArray) -> np.ndarray:
+        """Maps an array in the arena without copying it"""
+        return np.ndarray(ref.shape, dtype=np.dtype(ref.dtype), buffer=self.shm.buf,
+                          offset=ARENAHEADER.size + ref.position % self.capacity)
+
+    def resolve(self, message: Message) -> List[SharedArray]:
+        """Replaces SharedArrays in a message body with views. Returns the references so they can be released."""
+        refs = []
+        if isinstance(message.body, dict):
+            for key, value in message.body.items():
+                if isinstance(value, SharedArray):
+                    refs.append(value)
+                    message.body[key] = self.view(value)
+        return refs
+
+    def release(self, refs: List[SharedArray]):
+        """Frees the space used by these arrays, and anything stored before them."""
+        if len(refs) == 0:
+            return
+        self.releaseTo(max(ref.position + ref.nbytes for ref in refs))
+
+    def releaseTo(self, end: int):
+        with self.lock:
+            writepos, releasepos, droppedend = ARENAHEADER.unpack_from(self.shm.buf, 0)
+            ARENAHEADER.pack_into(self.shm.buf, 0, writepos, max(releasepos, end), droppedend)
+
+    def drop(self, end: int):
+        """
+        Called by the sender when a message holding arrays up to end is dropped, so the dashboard never
+        releases them. The space is freed by collect.
+        """
+        with self.lock:
+            writepos, releasepos, droppedend = ARENAHEADER.unpack_from(self.shm.buf, 0)
+            ARENAHEADER.pack_into(self.shm.buf, 0, writepos, releasepos, max(droppedend, end))
+
+    def collect(self):
+        """
+        Called by the dashboard each time it takes every queued message, once it has released the messages it
+        took before. Frees the space of messages dropped before the previous call, since every message sent
+        before them has been handled by then.
+        """
+        if self.collectable > 0:
+            self.releaseTo(self.collectable)
+        with self.lock:
+            self.collectable = ARENAHEADER.unpack_from(self.shm.buf, 0)[2]
+
+def arenaEnd(message: Message) -> int:
+    """End of the arena space used by the SharedArrays in a message body, 0 if it has none"""
+    if not isinstance(message.body, dict):
+        return 0
+    return max([value.position + value.nbytes for value in message.body.values() if isinstance(value, SharedArray)],
+               default=0)
+#endregion
+
+#region Shared Memory Ring Buffer
+HEADER = struct.Struct('<QQQQ') #head, tail, count, dropped
+RECORD = struct.Struct('<IB') #payload length, flags
+CONTROLFLAG = 1
+COMPACTFLAG = 2 #payload uses the compact encoding instead of pickle
+ARENAFLAG = 4 #payload ends with the end of the image arena space the message holds
+ARENAEND = struct.Struct('<Q')
+NAMETABLESIZE = 2**13 #bytes for interned metric names, stored between the header and the messages
+DATAOFFSET = HEADER.size + NAMETABLESIZE
+USED = struct.Struct('<I')
+
+fullPolicies = ['block', 'dropoldest', 'dropnewest']
+encodings = ['pickle', 'compact']
+
+def isControlMessage(message: Message):
+    """Control messages (Start, End, ForceUpdate...) are never dropped by a full buffer"""
+    return message.mode < 10
+
+def releaseSharedMemory(shm: shared_memory.SharedMemory, owner: bool):
+    """Closes a shared memory block, and removes it if this process created it."""
+    shm.close()
+    if owner:
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+
+def attachSharedMemory(name: str) -> shared_memory.SharedMemory:
+    """Attaches to an existing shared memory block without taking ownership of it"""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    return shared_memory.SharedMemory(name=name) #child processes share the creator's resource tracker
+
+class SharedNameTable:
+    """
+    NameTable stored in the ring buffer's shared memory, so every process attached to the buffer uses the
+    same ids. Names are added once per session and each process keeps a local copy of the ones it has read.
+    """
+    def __init__(self, shm: shared_memory.SharedMemory, lock):
+        self.shm = shm
+        self.lock = lock
+        self.names = []
+        self.ids = {}
+        self.position = USED.size #next entry that has not been read into the local copy
+
+    def refresh(self):
+        """Reads names added by other processes. The lock must be held."""
+        used = USED.unpack_from(self.shm.buf, HEADER.size)[0]
+        while self.position < used:
+            length = self.shm.buf[HEADER.size + self.position]
+            start = HEADER.size + self.position + 1
+            name = bytes(self.shm.buf[start:start + length]).decode('utf-8')
+            self.ids[name] = len(self.names)
+            self.names.append(name)
+            self.position += 1 + length
+
+    def intern(self, name: str) -> Union[int, None]:
+        if name in self.ids:
+            return self.ids[name]
+        encoded = name.encode('utf-8')
+        if len(encoded) > 255:
+            return None
+        with self.lock:
+            self.refresh()
+            if name not in self.ids:
+                used = USED.unpack_from(self.shm.buf, HEADER.size)[0]
+                if used + 1 + len(encoded) > NAMETABLESIZE:
+                    return None
+                self.shm.buf[HEADER.size + used] = len(encoded)
+                self.shm.buf[HEADER.size + used + 1:HEADER.size + used + 1 + len(encoded)] = encoded
+                USED.pack_into(self.shm.buf, HEADER.size, used + 1 + len(encoded))
+                self.refresh()
+        return self.ids[name]
+
+    def lookup(self, nameid: int) -> str:
+        if nameid >= len(self.names):
+            with self.lock:
+                self.refresh()
+        return self.names[nameid]
+
+class SharedMemoryRingBuffer:
+    """
+    Fixed capacity message queue stored in shared memory. Messages are pickled once into the buffer instead of
+    being sent through a manager process. Supports the parts of the list api used by the dashboard
+    (append, pop(0) and len) so it can be used as an updatelist.
+    """
+    def __init__(self, capacity: int = 2**26, fullpolicy: str = 'block', imagearenasize: int = 0,
+                 encoding: str = 'pickle'):
+        """
+        :param capacity: Size of the buffer in bytes
+        :param fullpolicy: What append does when the buffer is full: 'block', 'dropoldest' or 'dropnewest'
+        :param imagearenasize: Size in bytes of the SharedImageArena used for image samples (0 to disable)
+        :param encoding: 'pickle', or 'compact' to send metric messages with their schema (see encodeMessage)
+        """
+        if fullpolicy not in fullPolicies:
+            raise Exception("Full policy: " + str(fullpolicy) + " not valid.")
+        if encoding not in encodings:
+            raise Exception("Encoding: " + str(encoding) + " not valid.")
+        self.capacity = capacity
+        self.fullpolicy = fullpolicy
+        self.encoding = encoding
+        self.condition = multiprocessing.Condition()
+        self.shm = shared_memory.SharedMemory(create=True, size=DATAOFFSET + capacity)
+        HEADER.pack_into(self.shm.buf, 0, 0, 0, 0, 0)
+        USED.pack_into(self.shm.buf, HEADER.size, USED.size)
+        self._finalizer = weakref.finalize(self, releaseSharedMemory, self.shm, True)
+        self.names = SharedNameTable(self.shm, self.condition)
+        self.imagearena = SharedImageArena(imagearenasize) if imagearenasize > 0 else None
+        self.consumer = None #process reading the buffer, checked while append waits
+        self.consumergone = False
+
+    def watch(self, consumer: multiprocessing.Process):
+        """Stops append from waiting for room once this process (the dashboard) has exited"""
+        self.consumer = consumer
+
+    def __getstate__(self):
+        return {'name': self.shm.name, 'capacity': self.capacity, 'fullpolicy': self.fullpolicy,
+                'encoding': self.encoding, 'condition': self.condition, 'imagearena': self.imagearena}
+
+    def __setstate__(self, state):
+        self.capacity = state['capacity']
+        self.fullpolicy = state['fullpolicy']
+        self.encoding = state['encoding']
+        self.condition = state['condition']
+        self.imagearena = state['imagearena']
+        self.shm = attachSharedMemory(state['name'])
+        self._finalizer = weakref.finalize(self, releaseSharedMemory, self.shm, False)
+        self.names = SharedNameTable(self.shm, self.condition)
+        self.consumer = None
+        self.consumergone = False
+
+    def close(self):
+        """Releases the shared memory. The buffer can not be used after this is called."""
+        self._finalizer()
+        if self.imagearena is not None:
+            self.imagearena.close()
+
+    #region raw buffer access
+    def _write(self, pos: int, data: bytes):
+        offset = pos % self.capacity
+        first = min(len(data), self.capacity - offset)
+        self.shm.buf[DATAOFFSET + offset:DATAOFFSET + offset + first] = data[:first]
+        if first < len(data):
+            self.shm.buf[DATAOFFSET:DATAOFFSET + len(data) - first] = data[first:]
+
+    def _read(self, pos: int, size: int) -> bytes:
+        offset = pos % self.capacity
+        first = min(size, self.capacity - offset)
+        data = bytes(self.shm.buf[DATAOFFSET + offset:DATAOFFSET + offset + first])
+        if first < size:
+            data += bytes(self.shm.buf[DATAOFFSET:DATAOFFSET + size - first])
+        return data
+
+    def _readRecord(self, pos: int):
+        """Returns the payload, flags and total size of the record at pos"""
+        length, flags = RECORD.unpack(self._read(pos, RECORD.size))
+        return self._read(pos + RECORD.size, length), flags, RECORD.size + length
+
+    def _dropOldest(self, head: int, tail: int) -> Union[int, None]:
+        """
+        Removes the oldest record that is not a control message. Control records queued before it are moved
+        forward into its space. Returns the new head, or None if every record is a control message.
+        """
+        controls = []
+        pos = head
+        while pos < tail:
+            length, flags = RECORD.unpack(self._read(pos, RECORD.size))
+            size = RECORD.size + length
+            if not flags & CONTROLFLAG:
+                if flags & ARENAFLAG:
+                    self.imagearena.drop(ARENAEND.unpack(self._read(pos + size - ARENAEND.size, ARENAEND.size))[0])
+                moved = b''.join(self._read(start, recordsize) for start, recordsize in controls)
+                newhead = pos + size - len(moved)
+                self._write(newhead, moved)
+                return newhead
+            controls.append((pos, size))
+            pos += size
+        return None
+    #endregion
+
+    def encode(self, message: Message):
+        """Returns the payload and flags of a record"""
+        flags = CONTROLFLAG if isControlMessage(message) else 0
+        if self.encoding == 'compact':
+            data = encodeMessage(message, self.names)
+            if data is not None:
+                return data, flags | COMPACTFLAG
+        data = pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL)
+        end = arenaEnd(message) if self.imagearena is not None else 0
+        if end > 0: #kept so the space can be freed if the record is dropped
+            return data + ARENAEND.pack(end), flags | ARENAFLAG
+        return data, flags
+
+    def decode(self, data: bytes, flags: int) -> Message:
+        if flags & COMPACTFLAG:
+            return decodeMessage(data, self.names)
+        return pickle.loads(data) #a trailing arena end is not read by pickle
+
+    def dropRecord(self, data: bytes, flags: int):
+        if flags & ARENAFLAG:
+            self.imagearena.drop(ARENAEND.unpack_from(data, len(data) - ARENAEND.size)[0])
+
+    def append(self, message: Message):
+        data, flags = self.encode(message)
+        size = RECORD.size + len(data)
+        if size > self.capacity:
+            raise Exception("Message of " + str(size) + " bytes does not fit in ring buffer of " +
+                            str(self.capacity) + " bytes.")
+        control = flags & CONTROLFLAG
+
+        with self.condition:
+            head, tail, count, dropped = HEADER.unpack_from(self.shm.buf, 0)
+            while self.capacity - (tail - head) < size:
+                if self.fullpolicy == 'dropnewest' and not control:
+                    self.dropRecord(data, flags)
+                    HEADER.pack_into(self.shm.buf, 0, head, tail, count, dropped + 1)
+                    return
+
+                newhead = self._dropOldest(head, tail) if self.fullpolicy == 'dropoldest' else None
+                if newhead is not None:
+                    head = newhead
+                    count -= 1
+                    dropped += 1
+                elif self.consumergone or (self.consumer is not None and not self.consumer.is_alive()):
+                    if not self.consumergone:
+                        self.consumergone = True
+                        warnings.warn("Dashboard process exited, messages that don't fit are dropped.")
+                    self.dropRecord(data, flags)
+                    HEADER.pack_into(self.shm.buf, 0, head, tail, count, dropped + 1)
+                    return
+                else:
+                    HEADER.pack_into(self.shm.buf, 0, head, tail, count, dropped)
+                    self.condition.wait(0.5) #wakes up to check that the dashboard is still running
+                    head, tail, count, dropped = HEADER.unpack_from(self.shm.buf, 0)
+
+            self._write(tail, RECORD.pack(len(data), flags) + data)
+            HEADER.pack_into(self.shm.buf, 0, head, tail + size, count + 1, dropped)
+            self.condition.notify_all()
+
+    def pop(self, index: int = 0) -> Message:
+        """Removes and returns the oldest message. Only index 0 is supported."""
+        if index != 0:
+            raise Exception("Ring buffer only supports pop(0).")
+        with self.condition:
+            head, tail, count, dropped = HEADER.unpack_from(self.shm.buf, 0)
+            if count == 0:
+                raise IndexError("pop from empty ring buffer")
+            data, flags, size = self._readRecord(head)
+            HEADER.pack_into(self.shm.buf, 0, head + size, tail, count - 1, dropped)
+            self.condition.notify_all()
+        return self.decode(data, flags)
+
+    def drain(self) -> List[Message]:
+        """
+        Removes and returns every queued message in one call. The messages from the previous call must have been
+        released from the image arena, since space held by dropped messages sent before them is freed here.
+        """
+        if self.imagearena is not None:
+            self.imagearena.collect()
+        records = []
+        with self.condition:
+            head, tail, count, dropped = HEADER.unpack_from(self.shm.buf, 0)
+            pos = head
+            for _ in range(0, count):
+                data, flags, size = self._readRecord(pos)
+                records.append((data, flags))
+                pos += size
+            HEADER.pack_into(self.shm.buf, 0, pos, tail, 0, dropped)
+            self.condition.notify_all()
+        return [self.decode(data, flags) for data, flags in records]
+
+    def __len__(self):
+        with self.condition:
+            return HEADER.unpack_from(self.shm.buf, 0)[2]
+
+    @property
+    def dropped(self) -> int:
+        """Number of messages dropped because the buffer was full"""
+        with self.condition:
+            return HEADER.unpack_from(self.shm.buf, 0)[3]
+#endregion
+
+#region Command Queue
+class CommandQueue:
+    """
+    Carries requests and commands from the dashboard to the callbacks (the returnlist). Appending never waits,
+    and the callbacks take every message of the modes they handle in one call instead of scanning a shared list.
+    Start travels through the same queue, so every request the dashboard made before starting has been
+    received once waitForStart returns.
+    The list api of the old returnlist (len, indexing, iteration, index, pop and remove) works on the messages
+    received so far, for custom callbacks written against it.
+    """
+    def __init__(self, local: bool = False):
+        """
+        :param local: Both ends are threads of one process (the socket transport), so no pipe is needed
+        """
+        self.local = local
+        self.queue = queue.SimpleQueue() if local else multiprocessing.Queue() #put returns right away
+        self.pending: List[Message] = [] #received by this process and not taken yet
+        self.isstarted = False #Start has been received by this process
+
+    def __getstate__(self):
+        if self.local:
+            raise Exception("A local CommandQueue can't be sent to another process.")
+        return {'queue': self.queue}
+
+    def __setstate__(self, state):
+        self.local = False
+        self.queue = state['queue']
+        self.pending = []
+        self.isstarted = False
+
+    def append(self, message: Message):
+        self.queue.put(message)
+
+    def keep(self, message: Message):
+        if message.mode == MessageMode.Start:
+            self.isstarted = True
+        else:
+            self.pending.append(message)
+
+    def receive(self):
+        """Moves every message that has arrived into pending"""
+        try:
+            while True:
+                self.keep(self.queue.get_nowait())
+        except queue.Empty:
+            pass
+
+    def take(self, modes: List[int] = None) -> List[Message]:
+        """Removes and returns the messages with these modes (every message if modes is None), oldest first"""
+        self.receive()
+        if modes is None:
+            taken, self.pending = self.pending, []
+            return taken
+        taken = [message for message in self.pending if message.mode in modes]
+        if len(taken) > 0:
+            self.pending = [message for message in self.pending if message.mode not in modes]
+        return taken
+
+    def waitForStart(self, timeout: float = None) -> bool:
+        """Blocks until the dashboard has started. Returns False if timeout seconds pass first."""
+        deadline = None if timeout is None else time.time() + timeout
+        self.receive()
+        while not self.isstarted:
+            remaining = None if deadline is None else deadline - time.time()
+            if remaining is not None and remaining <= 0:
+                return False
+            try:
+                self.keep(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                return False
+        return True
+
+    @property
+    def started(self) -> bool:
+        self.receive()
+        return self.isstarted
+
+    #region list api
+    def __len__(self):
+        self.receive()
+        return len(self.pending)
+
+    def __iter__(self):
+        self.receive()
+        return iter(list(self.pending))
+
+    def __getitem__(self, index):
+        return self.pending[index]
+
+    def index(self, message: Message) -> int:
+        return self.pending.index(message)
+
+    def pop(self, index: int = -1) -> Message:
+        return self.pending.pop(index)
+
+    def remove(self, message: Message):
+        self.pending.remove(message)
+    #endregion
+
+def takeMessages(returnlist, modes: List[int] = None) -> List[Message]:
+    """Removes and returns the messages with these modes from a returnlist, which may also be a plain list"""
+    if hasattr(returnlist, 'take'):
+        return returnlist.take(modes)
+    taken = []
+    for index in reversed(range(0, len(returnlist))):
+        if modes is None or returnlist[index].mode in modes:
+            taken.append(returnlist.pop(index))
+    taken.reverse()
+    return taken
+#endregion
+
+#region Socket Transport
+FRAME = struct.Struct('<I') #payload length, the payload is a pickled list of messages
+MAXFRAME = 2**30
+CHALLENGESIZE = 32
+HANDSHAKETIMEOUT = 10.0 #seconds a peer has to prove it has the authkey
+
+def parseAddress(address: str) -> Tuple[int, Union[tuple, str]]:
+    """Returns the socket family and address of 'tcp://host:port' or 'unix:///path/to/socket'"""
+    if address.startswith('unix://'):
+        if not hasattr(socket, 'AF_UNIX'):
+            raise Exception("Unix domain sockets are not supported on this platform.")
+        return socket.AF_UNIX, address[len('unix://'):]
+    if address.startswith('tcp://'):
+        host, _, port = address[len('tcp://'):].rpartition(':')
+        return socket.AF_INET, (host or '127.0.0.1', int(port))
+    raise Exception("Address: " + str(address) + " not valid, use tcp://host:port or unix:///path.")
+
+def authKey(authkey: Union[bytes, str, None]) -> bytes:
+    """Returns authkey as bytes, read from the MLDASHBOARD_AUTHKEY environment variable if it is None"""
+    if authkey is None:
+        authkey = os.environ.get('MLDASHBOARD_AUTHKEY')
+    if authkey is None or len(authkey) == 0:
+        raise Exception("The socket transport needs an authkey, pass one or set MLDASHBOARD_AUTHKEY.")
+    return authkey.encode() if isinstance(authkey, str) else bytes(authkey)
+
+def proveKey(sock: socket.socket, authkey: bytes, role: bytes, challenge: bytes):
+    sock.sendall(hmac.new(authkey, role + challenge, 'sha256').digest())
+
+def checkKey(sock: socket.socket, authkey: bytes, role: bytes, challenge: bytes):
+    expected = hmac.new(authkey, role + challenge, 'sha256').digest()
+    if not hmac.compare_digest(receiveExact(sock, len(expected)), expected):
+        raise multiprocessing.AuthenticationError("Peer does not have the authkey")
+
+def acceptHandshake(sock: socket.socket, authkey: bytes):
+    """
+    Dashboard side of the handshake. Each side sends a random challenge and the other answers with an HMAC of it,
+    so nothing is unpickled from a peer that does not have the authkey.
+    """
+    challenge = secrets.token_bytes(CHALLENGESIZE)
+    sock.sendall(challenge)
+    checkKey(sock, authkey, b'trainer', challenge)
+    proveKey(sock, authkey, b'dashboard', receiveExact(sock, CHALLENGESIZE))
+
+def connectHandshake(sock: socket.socket, authkey: bytes):
+    """Trainer side of the handshake"""
+    proveKey(sock, authkey, b'trainer', receiveExact(sock, CHALLENGESIZE))
+    challenge = secrets.token_bytes(CHALLENGESIZE)
+    sock.sendall(challenge)
+    checkKey(sock, authkey, b'dashboard', challenge)
+
+def sendFrame(sock: socket.socket, messages: list):
+    data = pickle.dumps(messages, protocol=pickle.HIGHEST_PROTOCOL)
+    sock.sendall(FRAME.pack(len(data)) + data)
+
+def receiveExact(sock: socket.socket, size: int) -> bytes:
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(min(size - len(data), 2**20))
+        if not chunk:
+            raise ConnectionError("Connection closed")
+        data += chunk
+    return bytes(data)
+
+def receiveFrame(sock: socket.socket) -> list:
+    length = FRAME.unpack(receiveExact(sock, FRAME.size))[0]
+    if length > MAXFRAME:
+        raise ConnectionError("Frame of " + str(length) + " bytes is too large")
+    return pickle.loads(receiveExact(sock, length))
+
+class SocketSender:
+    """
+    Sends messages from a trainer to a dashboard over TCP or a Unix domain socket. Works as the updatelist of
+    DashboardCallbacks: append only queues the message, and a background thread sends everything queued as one
+    frame, reconnecting if the dashboard is not there yet or goes away. When maxqueue messages are waiting the
+    oldest are dropped (control messages are kept), so training never waits for the dashboard.
+    End is sent by the background thread like any other message, and whatever is left is sent when the program
+    exits if the dashboard is connected. Messages from the dashboard are put in returnlist.
+    """
+    def __init__(self, address: str, worker: int = 0, maxqueue: int = 10000, retry: float = 1.0,
+                 authkey: Union[bytes, str] = None, flushtimeout: float = 0.0):
+        """
+        :param address: 'tcp://host:port' or 'unix:///path/to/socket'
+        :param worker: Id of this trainer, for example its rank in data parallel training
+        :param maxqueue: Messages kept while the dashboard is slow or absent
+        :param retry: Seconds between connection attempts
+        :param authkey: Key shared with the dashboard (default: the MLDASHBOARD_AUTHKEY environment variable)
+        :param flushtimeout: Seconds appending End waits for the queue to be sent, 0 never waits
+        """
+        self.address = address
+        self.authkey = authKey(authkey)
+        self.warned = False #about a dashboard without the authkey
+        self.worker = worker
+        self.maxqueue = maxqueue
+        self.retry = retry
+        self.flushtimeout = flushtimeout
+        self.connected = False
+        self.imagearena = None #images are sent in the frames
+        self.returnlist = CommandQueue(local=True)
+        self.queue = deque()
+        self.condition = threading.Condition()
+        self.sending = 0 #messages taken from the queue that are not sent yet
+        self.dropped = 0
+        self.closed = False
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        atexit.register(self.close) #the thread is a daemon, so queued messages would be lost at exit
+
+    def append(self, message: Message):
+        with self.condition:
+            if len(self.queue) >= self.maxqueue:
+                for index, queued in enumerate(self.queue):
+                    if not isControlMessage(queued):
+                        del self.queue[index]
+                        self.dropped += 1
+                        break
+            self.queue.append(message)
+            self.condition.notify()
+        if message.mode == MessageMode.End and self.flushtimeout > 0:
+            self.flush(self.flushtimeout)
+
+    def __len__(self):
+        with self.condition:
+            return len(self.queue) + self.sending
+
+    def connect(self) -> socket.socket:
+        family, address = parseAddress(self.address)
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        try:
+            sock.connect(address)
+            if family == socket.AF_INET:
+                if sock.getsockname() == sock.getpeername(): #connected to itself, nothing listens on the port
+                    raise ConnectionError("Dashboard is not listening")
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.settimeout(HANDSHAKETIMEOUT)
+            connectHandshake(sock, self.authkey)
+            sock.settimeout(None)
+            sendFrame(sock, [self.worker]) #hello
+        except multiprocessing.AuthenticationError:
+            sock.close()
+            if not self.warned:
+                self.warned = True
+                warnings.warn("Dashboard at " + self.address + " does not have the same authkey, nothing was sent.")
+            raise ConnectionError("Dashboard failed authentication")
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    def run(self):
+        while not self.closed:
+            try:
+                sock = self.connect()
+            except OSError:
+                time.sleep(self.retry)
+                continue
+            threading.Thread(target=self.receive, args=(sock,), daemon=True).start()
+            self.connected = True
+            try:
+                while True:
+                    with self.condition:
+                        while len(self.queue) == 0 and not self.closed:
+                            self.condition.wait()
+                        if len(self.queue) == 0:
+                            break
+                        batch = list(self.queue)
+                        self.queue.clear()
+                        self.sending = len(batch)
+                    try:
+                        sendFrame(sock, batch)
+                    except OSError:
+                        with self.condition: #sent again after reconnecting
+                            self.queue.extendleft(reversed(batch))
+                        raise
+                    finally:
+                        with self.condition:
+                            self.sending = 0
+                            self.condition.notify_all()
+            except OSError:
+                pass
+            finally:
+                self.connected = False
+                sock.close()
+
+    def receive(self, sock: socket.socket):
+        try:
+            while True:
+                for message in receiveFrame(sock):
+                    self.returnlist.append(message)
+        except (OSError, ConnectionError, EOFError, pickle.UnpicklingError):
+            pass
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Waits up to timeout seconds for queued messages to be sent. Returns False if some are still queued."""
+        deadline = time.time() + timeout
+        with self.condition:
+            while len(self.queue) + self.sending > 0 and time.time() < deadline:
+                self.condition.wait(0.05)
+            return len(self.queue) + self.sending == 0
+
+    def close(self, timeout: float = None):
+        """
+        Waits up to timeout seconds for queued messages to be sent, then stops the sending thread.
+        By default it waits up to 5 seconds while connected to the dashboard, otherwise flushtimeout.
+        """
+        atexit.unregister(self.close)
+        if self.closed:
+            return
+        if timeout is None:
+            timeout = max(self.flushtimeout, 5.0) if self.connected else self.flushtimeout
+        self.flush(timeout)
+        with self.condition:
+            if len(self.queue) > 0:
+                warnings.warn(str(len(self.queue)) + " messages were not sent to the dashboard.")
+            self.closed = True
+            self.condition.notify_all()
+
+class EpochMerger:
+    """
+    Combines the Epoch_End messages of several workers into one message per epoch with the mean of each metric.
+    An epoch is sent once every active worker has finished it, or after timeout seconds with the workers
+    that have.
+    """
+    def __init__(self, timeout: float = 30.0):
+        self.timeout = timeout
+        self.epochs = {} #epochs finished by each worker
+        self.pending = {} #epoch: (first arrival time, {worker: body})
+        self.next = 0 #next epoch to send
+
+    def add(self, worker: int, body: dict):
+        epoch = self.epochs.get(worker, 0)
+        self.epochs[worker] = epoch + 1
+        if epoch >= self.next:
+            self.pending.setdefault(epoch, (time.time(), {}))[1][worker] = body
+
+    def ready(self, active: set) -> List[Message]:
+        """Merged messages for every finished epoch, in order"""
+        output = []
+        while self.next in self.pending:
+            arrival, bodies = self.pending[self.next]
+            if not active.issubset(bodies) and time.time() - arrival < self.timeout:
+                break
+            output.append(Message(MessageMode.Epoch_End, mergeBodies(list(bodies.values()))))
+            del self.pending[self.next]
+            self.next += 1
+        return output
+
+class BatchMerger:
+    """
+    Combines the Train_Batch_End messages of several workers into one message per step, so the dashboard gets
+    one point per step in order. Each worker sends steps in order, so a step is sent once every worker passed to
+    ready has reached it, or after timeout seconds with the workers that have.
+    Batches that arrive after their step was sent are dropped.
+    """
+    def __init__(self, timeout: float = 30.0):
+        self.timeout = timeout
+        self.latest = {} #last step received from each worker
+        self.pending = {} #step: (first arrival time, {worker: body})
+        self.last = None #last step sent
+
+    def add(self, worker: int, body: dict) -> bool:
+        """Returns False if the body has no step, so it can not be merged"""
+        step = body.get('step')
+        if step is None:
+            return False
+        self.latest[worker] = max(step, self.latest.get(worker, step))
+        if self.last is None or step > self.last:
+            self.pending.setdefault(step, (time.time(), {}))[1][worker] = body
+        return True
+
+    def ready(self, senders: set) -> List[Message]:
+        """Merged messages for every finished step, in order. senders are the workers that are waited for."""
+        output = []
+        for step in sorted(self.pending):
+            arrival, bodies = self.pending[step]
+            if (any(worker not in self.latest or self.latest[worker] < step for worker in senders) and
+                    time.time() - arrival < self.timeout):
+                break
+            output.append(Message(MessageMode.Train_Batch_End, mergeBatches(list(bodies.values()))))
+            del self.pending[step]
+            self.last = step
+        return output
+
+def mergeBatches(bodies: List[dict]) -> dict:
+    """
+    Mean of each metric, with the smallest and largest value of any worker in 'min' and 'max'.
+    Ranges of batches merged by a send policy are kept. batch and step are taken from the first body.
+    """
+    if len(bodies) == 1:
+        return bodies[0]
+    merged = {key: value for key, value in mergeBodies(bodies).items() if key not in ['min', 'max', 'count']}
+    merged['batch'] = bodies[0].get('batch')
+    merged['step'] = bodies[0]['step']
+    merged['count'] = sum(body.get('count', 1) for body in bodies)
+    merged['min'], merged['max'] = {}, {}
+    for key, value in merged.items():
+        if key in ['batch', 'step', 'count', 'min', 'max'] or not isinstance(value, float):
+            continue
+        merged['min'][key] = min(body.get('min', {}).get(key, body[key]) for body in bodies if key in body)
+        merged['max'][key] = max(body.get('max', {}).get(key, body[key]) for body in bodies if key in body)
+    return merged
+
+def mergeBodies(bodies: List[dict]) -> dict:
+    """Mean of each numeric value. Other values are taken from the first body."""
+    merged = dict(bodies[0])
+    for key, value in merged.items():
+        values = [body[key] for body in bodies if key in body]
+        if isinstance(value, (int, float, np.number)) and not isinstance(value, bool) and key != 'epoch':
+            merged[key] = float(np.mean(values))
+    return merged
+
+class SocketReturnList:
+    """Returnlist of a SocketServer. Commands and Start go to every worker, other messages to the first worker."""
+    def __init__(self, server):
+        self.server = server
+
+    def append(self, message: Message):
+        self.server.send(message)
+
+    def __len__(self):
+        return 0
+
+    def __iter__(self):
+        return iter([])
+
+class SocketServer:
+    """
+    Receives messages from one or more trainers for a Dashboard. Works as the updatelist of the dashboard,
+    with returnlist sending requests back. Every message is tagged with the worker that sent it,
+    Epoch_End and Train_Batch_End messages are merged across workers, and End is only passed on once every
+    worker has ended.
+    If every worker disconnects without ending, End is passed on after disconnecttimeout seconds.
+    """
+    def __init__(self, address: str, mergetimeout: float = 30.0, authkey: Union[bytes, str] = None,
+                 disconnecttimeout: float = 10.0):
+        """
+        :param address: 'tcp://host:port' (port 0 picks a free port) or 'unix:///path/to/socket'
+        :param mergetimeout: Seconds to wait for slow workers before an epoch or batch is shown without them
+        :param disconnecttimeout: Seconds to wait for a worker to reconnect once none are connected
+        :param authkey: Key trainers must have to connect (default: the MLDASHBOARD_AUTHKEY environment variable)
+        """
+        self.authkey = authKey(authkey)
+        family, bindaddress = parseAddress(address)
+        self.listener = socket.socket(family, socket.SOCK_STREAM)
+        if family == socket.AF_INET:
+            self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        elif os.path.exists(bindaddress):
+            os.unlink(bindaddress) #left over from a previous dashboard
+        self.listener.bind(bindaddress)
+        self.listener.listen()
+        if family == socket.AF_INET:
+            host, port = self.listener.getsockname()[:2]
+            address = 'tcp://' + host + ':' + str(port)
+        self.address = address
+
+        self.imagearena = None
+        self.returnlist = SocketReturnList(self)
+        self.lock = threading.Lock()
+        self.inbox: List[Message] = []
+        self.outbox: List[Message] = [] #requests made before any worker connected
+        self.connections = {} #worker: (socket, send lock)
+        self.ended = set()
+        self.merger = EpochMerger(mergetimeout)
+        self.batchmerger = BatchMerger(mergetimeout)
+        self.started = False
+        self.finished = False #End was passed on
+        self.disconnecttimeout = disconnecttimeout
+        self.disconnected = None #time the last worker disconnected without ending
+        self.closed = False
+        threading.Thread(target=self.accept, daemon=True).start()
+
+    def accept(self):
+        while not self.closed:
+            try:
+                sock, _ = self.listener.accept()
+            except OSError:
+                return
+            threading.Thread(target=self.receive, args=(sock,), daemon=True).start()
+
+    def receive(self, sock: socket.socket):
+        worker = None
+        try:
+            sock.settimeout(HANDSHAKETIMEOUT)
+            acceptHandshake(sock, self.authkey) #before anything is unpickled
+            worker = receiveFrame(sock)[0]
+            sock.settimeout(None)
+            with self.lock:
+                self.connections[worker] = (sock, threading.Lock())
+                self.ended.discard(worker)
+                self.disconnected = None
+                pending = [Message(MessageMode.Start, {})] if self.started else []
+                pending += self.outbox
+                self.outbox = []
+            if len(pending) > 0:
+                self.sendTo(worker, pending)
+            while True:
+                messages = receiveFrame(sock)
+                with self.lock:
+                    for message in messages:
+                        message.worker = worker
+                        self.route(message)
+        except multiprocessing.AuthenticationError:
+            warnings.warn("A connection without the authkey was refused.")
+        except (OSError, ConnectionError, EOFError, pickle.UnpicklingError):
+            pass
+        finally:
+            sock.close()
+            if worker is not None:
+                with self.lock:
+                    if worker in self.connections and self.connections[worker][0] is sock:
+                        del self.connections[worker]
+                    self.flushMerged()
+                    if len(self.connections) == 0 and not self.finished:
+                        self.disconnected = time.time()
+
+    def active(self) -> set:
+        return set(self.connections) - self.ended
+
+    def route(self, message: Message):
+        """Adds a message to the inbox, merging epochs and batches and holding End until every worker has ended"""
+        if message.mode == MessageMode.Epoch_End:
+            self.merger.add(message.worker, message.body)
+            self.flushMerged()
+        elif message.mode == MessageMode.Train_Batch_End and self.batchmerger.add(message.worker, message.body):
+            self.flushMerged()
+        elif message.mode == MessageMode.End:
+            self.ended.add(message.worker)
+            self.flushMerged()
+            if len(self.active()) == 0:
+                self.inbox.append(message)
+                self.finished = True
+        else:
+            self.inbox.append(message)
+
+    def flushMerged(self):
+        active = self.active()
+        #a worker that finished an epoch without sending a batch does not send them, so it is not waited for
+        senders = {worker for worker in active
+                   if worker in self.batchmerger.latest or self.merger.epochs.get(worker, 0) == 0}
+        self.inbox.extend(self.batchmerger.ready(senders))
+        self.inbox.extend(self.merger.ready(active))
+
+    def drain(self) -> List[Message]:
+        with self.lock:
+            self.flushMerged() #epochs and batches held back by a slow worker
+            if (self.disconnected is not None and len(self.connections) == 0 and not self.finished and
+                    time.time() - self.disconnected > self.disconnecttimeout):
+                warnings.warn("Every trainer disconnected without sending End, the dashboard is ending.")
+                self.inbox.extend(self.batchmerger.ready(set())) #batches and epochs still waiting for a worker
+                self.inbox.extend(self.merger.ready(set()))
+                self.inbox.append(Message(MessageMode.End, {}))
+                self.finished = True
+            messages = self.inbox
+            self.inbox = []
+        return messages
+
+    def __len__(self):
+        with self.lock:
+            return len(self.inbox)
+
+    def sendTo(self, worker: int, messages: List[Message]):
+        with self.lock:
+            connection = self.connections.get(worker)
+        if connection is None:
+            return
+        try:
+            with connection[1]:
+                sendFrame(connection[0], messages)
+        except OSError:
+            pass #the receiving thread removes the connection
+
+    def send(self, message: Message):
+        with self.lock:
+            if message.mode == MessageMode.Start:
+                self.started = True
+            workers = sorted(self.connections)
+            if len(workers) == 0 and message.mode != MessageMode.Start:
+                self.outbox.append(message)
+                return
+        if message.mode not in [MessageMode.Start, MessageMode.Command]:
+            workers = workers[:1] #data requests are answered by one worker
+        for worker in workers:
+            self.sendTo(worker, [message])
+
+    def close(self):
+        self.closed = True
+        self.listener.close()
+        with self.lock:
+            connections = list(self.connections.values())
+        for sock, _ in connections:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+#endregion
+
+def createUpdateList(transport: str, syncmanager, buffersize: int, fullpolicy: str,
+                     imagearenasize: int, encoding: str = 'pickle') -> List[Message]:
+    """Creates the list that carries messages from the callbacks to the dashboard"""
+    if transport == 'manager':
+        return syncmanager.list()
+    elif transport == 'sharedmemory':
+        return SharedMemoryRingBuffer(buffersize, fullpolicy, imagearenasize, encoding)
+    raise Exception("Transport: " + str(transport) + " not valid.")
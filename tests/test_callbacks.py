@@ -0,0 +1,74 @@
+import os
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2' #stops agressive error message printing
+import numpy as np
+from tensorflow import keras
+from MLDashboard.MLCallbacksBackend import BatchEnvelope, ModelSaver, SendPolicy, copyModel, optimizerState
+from MLDashboard.MLCommunicationBackend import MessageMode
+
+def get_model():
+    model = keras.Sequential([keras.Input((4,)), keras.layers.Dense(8, activation='relu'), keras.layers.Dense(3)])
+    model.compile(optimizer='adam', loss=keras.losses.SparseCategoricalCrossentropy(from_logits=True),
+                  metrics=["accuracy"])
+    return model
+
+def test_saved_model_keeps_optimizer_state(tmp_path):
+    model = get_model()
+    x = np.random.rand(64, 4).astype("float32")
+    y = np.random.randint(0, 3, 64)
+    model.fit(x, y, epochs=2, verbose=0)
+
+    updatelist = []
+    saver = ModelSaver(copyModel(model), updatelist)
+    snapshot = (model.get_weights(), optimizerState(model))
+    saver.submit(snapshot, str(tmp_path / 'model.keras'))
+    saver.wait()
+    model.fit(x, y, epochs=1, verbose=0) #training continues after the snapshot
+
+    assert updatelist[0].mode == MessageMode.Model_Saved and updatelist[0].body['error'] is None
+    loaded = keras.models.load_model(str(tmp_path / 'model.keras'))
+    for variable, value in zip(loaded.optimizer.variables, snapshot[1]):
+        assert np.allclose(variable.numpy(), value)
+    for weight, value in zip(loaded.get_weights(), snapshot[0]):
+        assert np.allclose(weight, value)
+    assert int(loaded.optimizer.iterations.numpy()) < int(model.optimizer.iterations.numpy())
+
+def offer_batches(policy, losses, updatelist=None):
+    updatelist = [] if updatelist is None else updatelist
+    sent = []
+    for batch, loss in enumerate(losses):
+        body = policy.offer({'batch': batch, 'step': batch, 'loss': loss}, updatelist)
+        if body is not None:
+            sent.append(body)
+    return sent
+
+def test_send_policy_sends_every_batch_by_default():
+    losses = [float(i) for i in range(0, 5)]
+    assert [body['loss'] for body in offer_batches(SendPolicy(), losses)] == losses
+
+def test_send_policy_aggregates_skipped_batches():
+    sent = offer_batches(SendPolicy(every=4), [4.0, 1.0, 3.0, 8.0, 2.0, 2.0, 2.0, 2.0, 5.0])
+    assert len(sent) == 2
+    assert sent[0]['batch'] == 3 and sent[0]['count'] == 4
+    assert sent[0]['loss'] == 4.0 and sent[0]['min'] == {'loss': 1.0} and sent[0]['max'] == {'loss': 8.0}
+    assert sent[1]['batch'] == 7 and sent[1]['loss'] == 2.0 and sent[1]['min'] == sent[1]['max'] == {'loss': 2.0}
+
+def test_send_policy_without_aggregation_sends_the_latest_batch():
+    sent = offer_batches(SendPolicy(every=3, aggregate=False), [1.0, 2.0, 3.0, 4.0, 5.0, 6.0])
+    assert sent == [{'batch': 2, 'step': 2, 'loss': 3.0}, {'batch': 5, 'step': 5, 'loss': 6.0}]
+
+def test_send_policy_backs_off_while_the_dashboard_is_behind():
+    policy = SendPolicy(adaptive=True, maxbacklog=10)
+    assert len(offer_batches(policy, [1.0] * 8, updatelist=[None] * 20)) == 0
+    assert policy.interval > 1
+    sent = offer_batches(policy, [1.0] * 64)
+    assert sum(body.get('count', 1) for body in sent) == 8 + 64 #batches held during backoff are not lost
+    assert policy.interval == 1
+
+def test_envelope_ignores_arrays_and_keeps_the_latest_values():
+    envelope = BatchEnvelope()
+    envelope.add({'batch': 0, 'loss': 1.0, 'outputs': np.zeros(3)})
+    envelope.add({'batch': 1, 'loss': 3.0, 'outputs': np.ones(3)})
+    body = envelope.flush({'batch': 1, 'loss': 3.0, 'outputs': np.ones(3)})
+    assert body['loss'] == 2.0 and body['count'] == 2 and body['batch'] == 1
+    assert np.array_equal(body['outputs'], np.ones(3))
+    assert envelope.count == 0
@@ -0,0 +1,36 @@
+from MLDashboard.MLCommunicationBackend import Message, MessageMode
+from MLDashboard.MLDashboardBackend import coalesceMessages, drainUpdates
+
+def batch(i, worker=None, mode=MessageMode.Train_Batch_End):
+    return Message(mode, {'batch': i, 'loss': float(i)}, worker=worker)
+
+def test_runs_are_merged_into_the_latest():
+    messages = [batch(0), batch(1), batch(2), Message(MessageMode.Epoch_End, {'loss': 1.0}), batch(3), batch(4)]
+    output, merged = coalesceMessages(messages)
+    assert merged == 3
+    assert [message.mode for message in output] == [MessageMode.Train_Batch_End, MessageMode.Epoch_End,
+                                                    MessageMode.Train_Batch_End]
+    assert output[0].body['batch'] == 2
+    assert [body['batch'] for body in output[0].series] == [0, 1, 2]
+    assert [body['batch'] for body in output[2].series] == [3, 4]
+
+def test_single_messages_are_kept():
+    message = batch(0)
+    output, merged = coalesceMessages([message, Message(MessageMode.Epoch_End, {})])
+    assert merged == 0 and output[0] is message and output[0].series is None
+
+def test_other_modes_and_workers_are_not_merged():
+    epochs = [Message(MessageMode.Epoch_End, {'loss': 1.0}), Message(MessageMode.Epoch_End, {'loss': 2.0})]
+    assert coalesceMessages(epochs) == (epochs, 0)
+    output, merged = coalesceMessages([batch(0, 0), batch(0, 1), batch(1, 1),
+                                       batch(0, 1, MessageMode.Test_Batch_End)])
+    assert merged == 1
+    assert [(message.worker, message.mode) for message in output] == [
+        (0, MessageMode.Train_Batch_End), (1, MessageMode.Train_Batch_End), (1, MessageMode.Test_Batch_End)]
+
+def test_drain_keeps_later_messages():
+    updatelist = [batch(0), batch(1)]
+    drained = drainUpdates(updatelist)
+    assert len(drained) == 2 and updatelist == []
+    updatelist.append(batch(2))
+    assert drainUpdates(updatelist)[0].body['batch'] == 2
@@ -0,0 +1,39 @@
+import numpy as np
+from MLDashboard.MLCommunicationBackend import Message, MessageMode, NameTable, decodeMessage, encodeMessage
+
+def round_trip(message, names=None):
+    names = NameTable() if names is None else names
+    data = encodeMessage(message, names)
+    assert data is not None
+    return decodeMessage(data, names)
+
+def test_metrics_round_trip():
+    body = {'batch': 7, 'step': 1200, 'loss': 0.25, 'accuracy': np.float32(0.75),
+            'min': {'loss': 0.125}, 'max': {'loss': 0.5, 'step': 1300}}
+    message = Message(MessageMode.Train_Batch_End, body, time=1234.5)
+    decoded = round_trip(message)
+    assert decoded.mode == MessageMode.Train_Batch_End
+    assert decoded.body == {'batch': 7, 'step': 1200, 'loss': 0.25, 'accuracy': 0.75,
+                            'min': {'loss': 0.125}, 'max': {'loss': 0.5, 'step': 1300}}
+    assert type(decoded.body['batch']) is int and type(decoded.body['max']['step']) is int
+    assert type(decoded.body['loss']) is float
+    assert decoded.time == 1234.5
+
+def test_layouts_are_reused():
+    names = NameTable()
+    first = encodeMessage(Message(MessageMode.Epoch_End, {'loss': 1.0, 'accuracy': 0.5}), names)
+    second = encodeMessage(Message(MessageMode.Epoch_End, {'loss': 2.0, 'accuracy': 0.25}), names)
+    assert len(first) == len(second)
+    assert decodeMessage(second, names).body == {'loss': 2.0, 'accuracy': 0.25}
+    assert decodeMessage(first, names).body == {'loss': 1.0, 'accuracy': 0.5}
+    assert len(names.names) == 2
+
+def test_empty_body():
+    assert round_trip(Message(MessageMode.ForceUpdate, {})).body == {}
+
+def test_bodies_outside_the_schema_are_pickled():
+    names = NameTable()
+    assert encodeMessage(Message(MessageMode.Train_Set_Sample, {'x': np.zeros((2, 4))}), names) is None
+    assert encodeMessage(Message(MessageMode.Epoch_End, {'loss': 'nan'}), names) is None
+    assert encodeMessage(Message(MessageMode.Epoch_End, {'loss': 1.0}, series=[{'loss': 1.0}]), names) is None
+    assert encodeMessage(Message(MessageMode.Epoch_End, {1: 1.0}), names) is None
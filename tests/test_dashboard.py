@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+from matplotlib import pyplot
+from MLDashboard.DashboardModules.TrainingSetSampleImages import TrainingSetSampleImages
+from MLDashboard.MLDashboardBackend import Dashboard
+from MLDashboard.MLCommunicationBackend import Message, MessageMode
+from MLDashboard.MLRenderBackend import BufferFrameSink
+
+def get_config(layout, channels):
+    return {"modules": [[["LossMetricsGraph", {}],
+                         ["BatchMetricsGraph", {}],
+                         ["TrainingSetSampleImages", {"layout": layout, "channels": channels}]]],
+            "config": {"width": 8, "height": 8, "rows": 2, "cols": 2, "refreshrate": 1},
+            "dashboard": {"workers": 0}}
+
+def run_dashboard(configjson, messages):
+    sink = BufferFrameSink()
+    returnlist = []
+    dashboard = Dashboard(configjson, list(messages) + [Message(MessageMode.End, {})], returnlist,
+                          headless=True, framesink=sink)
+    dashboard.runDashboardLoop()
+    return dashboard, sink, returnlist
+
+@pytest.mark.parametrize("layout", ["grid", "mosaic"])
+@pytest.mark.parametrize("channels", [1, 3])
+def test_epoch_end_before_samples(layout, channels):
+    sample = Message(MessageMode.Train_Set_Sample, {'x': np.random.rand(4, 8 * 8 * channels).astype(np.float32),
+                                                    'y': np.arange(4)})
+    epoch = Message(MessageMode.Epoch_End, {'loss': 1.0, 'accuracy': 0.5})
+    dashboard, sink, returnlist = run_dashboard(get_config(layout, channels), [epoch, sample, epoch])
+    assert sink.framecount > 0
+    assert dashboard.store.counts['epoch'] == 2
+    assert any(message.mode == MessageMode.Train_Set_Sample for message in returnlist)
+
+def test_batches_are_drawn():
+    batches = [Message(MessageMode.Train_Batch_End, {'batch': i, 'step': i, 'loss': 1 / (i + 1)})
+               for i in range(0, 50)]
+    dashboard, sink, returnlist = run_dashboard(get_config("grid", 1), batches)
+    assert dashboard.store.counts['batch'] == 50
+    assert sink.framecount > 0
+
+def test_batches_out_of_order_are_not_stored():
+    steps = [0, 1, 2, 1, 3, 3, 4]
+    batches = [Message(MessageMode.Train_Batch_End, {'batch': step, 'step': step, 'loss': 1.0}) for step in steps]
+    dashboard, sink, returnlist = run_dashboard(get_config("grid", 1), batches)
+    x, y, low, high = dashboard.store.query('batch', 'loss')
+    assert np.array_equal(x, [0, 1, 2, 3, 4])
+
+@pytest.mark.parametrize("channels,conversion", [(1, None), (3, None), (3, 'L')])
+def test_grid_tiles_reuse_artists(channels, conversion):
+    config = {"width": 8, "height": 8, "rows": 2, "cols": 2, "refreshrate": 1, "channels": channels}
+    if conversion is not None:
+        config["conversion"] = conversion
+    fig = pyplot.figure()
+    try:
+        module = TrainingSetSampleImages(fig.add_subplot(), config)
+        counts = []
+        for refresh in range(0, 5):
+            x = np.random.randint(0, 255, (4, 8 * 8 * channels), dtype=np.uint8)
+            module.update(Message(MessageMode.Train_Set_Sample, {'x': x, 'y': np.arange(4)}))
+            module.update(Message(MessageMode.Epoch_End, {}))
+            counts.append((len(fig.axes), sum(len(ax.get_children()) for ax in fig.axes)))
+            tile = module.artists[0].get_array()
+            assert tile.dtype == np.uint8
+            if conversion is None: #drawn from the pixels without PIL
+                assert np.array_equal(tile, x[0].reshape((8, 8, channels)).squeeze())
+            else:
+                assert tile.shape == (8, 8)
+        assert len(set(counts)) == 1
+        assert len(module.artists) == 4 and all(len(ax.images) == 1 for ax in module.axes)
+    finally:
+        pyplot.close(fig)
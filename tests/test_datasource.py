@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+from MLDashboard.MLDataSourceBackend import (ArraySource, NpySource, RandomAccessSource, StreamSource,
+                                             createDataSource)
+
+def get_data(count=20):
+    x = np.arange(0, count * 6, dtype=np.float32).reshape(count, 6)
+    y = np.arange(0, count) % 3
+    return x, y
+
+def test_array_source_indexing():
+    x, y = get_data()
+    source = createDataSource(x, y)
+    assert isinstance(source, ArraySource) and source.length == 20
+    indices = np.array([5, 0, 19, 5])
+    features, labels = source.read(indices)
+    assert np.array_equal(features, x[indices]) and np.array_equal(labels, y[indices])
+    assert np.array_equal(source.labels(indices), y[indices])
+    assert np.array_equal(source.rowRange(15, 30), np.arange(15, 20))
+    assert len(source.rowRange(25, 30)) == 0
+
+def test_npy_source_reads_rows_from_disk(tmp_path):
+    x, y = get_data()
+    np.save(tmp_path / 'x.npy', x)
+    np.save(tmp_path / 'y.npy', y)
+    source = createDataSource(str(tmp_path / 'x.npy'), str(tmp_path / 'y.npy'))
+    assert isinstance(source, NpySource) and isinstance(source.x, np.memmap)
+    features, labels = source.read(np.array([3, 17]))
+    assert np.array_equal(features, x[[3, 17]]) and np.array_equal(labels, y[[3, 17]])
+    with pytest.raises(Exception):
+        createDataSource(str(tmp_path / 'x.npy'), y)
+
+def test_random_access_source():
+    x, y = get_data()
+    dataset = [(x[i], y[i]) for i in range(0, 20)]
+    source = RandomAccessSource(dataset, cachesize=4, prefetch=0)
+    features, labels = source.read(np.array([2, 7]))
+    assert np.array_equal(features, x[[2, 7]]) and np.array_equal(labels, y[[2, 7]])
+    assert source.length == 20
+
+def test_stream_source_reads_in_order_and_restarts():
+    x, y = get_data()
+    source = StreamSource(lambda: ((x[i:i + 5], y[i:i + 5]) for i in range(0, 20, 5)), window=4, prefetch=2)
+    try:
+        features, labels = source.read(np.array([0, 1, 2]))
+        assert np.array_equal(features, x[:3]) and np.array_equal(labels, y[:3])
+        features, labels = source.read(np.array([12, 1])) #row 1 is outside the window, the stream restarts
+        assert np.array_equal(features, x[[12, 1]])
+        assert np.array_equal(source.rowRange(15, 40), np.arange(15, 20))
+        with pytest.raises(Exception):
+            source.read(np.array([25]))
+    finally:
+        source.close()
+
+def test_stream_source_of_single_rows():
+    x, y = get_data()
+    source = StreamSource([(x[i], y[i]) for i in range(0, 20)], batched=False, prefetch=2)
+    try:
+        features, labels = source.read(np.array([4, 9]))
+        assert np.array_equal(features, x[[4, 9]]) and np.array_equal(labels, y[[4, 9]])
+    finally:
+        source.close()
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+from MLDashboard.MLCommunicationBackend import Message, MessageMode
+from MLDashboard.MLDashboardBackend import Dashboard, coalesceMessages, replayDashboard
+from MLDashboard.MLRecorderBackend import MessageRecorder, logRuns, readLog
+from MLDashboard.MLRenderBackend import BufferFrameSink
+
+def record(path, messages):
+    recorder = MessageRecorder(str(path))
+    recorder.record(messages)
+    recorder.close()
+
+def test_round_trip_with_images(tmp_path):
+    path = tmp_path / 'run.mldlog'
+    images = np.random.randint(0, 255, (4, 8, 8), dtype=np.uint8)
+    sample = Message(MessageMode.Train_Set_Sample, {'x': images, 'y': np.arange(4)})
+    batches = [Message(MessageMode.Train_Batch_End, {'batch': i, 'loss': 1 / (i + 1), 'min': {'loss': 0.5}},
+                       worker=2) for i in range(0, 5)]
+    record(path, [sample, sample] + batches + [Message(MessageMode.End, {})])
+
+    recorded = [message for recordedtime, message in readLog(str(path))]
+    assert [message.mode for message in recorded] == ([MessageMode.Train_Set_Sample] * 2 +
+                                                      [MessageMode.Train_Batch_End] * 5 + [MessageMode.End])
+    assert np.array_equal(recorded[0].body['x'], images) and np.array_equal(recorded[1].body['x'], images)
+    assert np.array_equal(recorded[0].body['y'], np.arange(4))
+    assert [message.body for message in recorded[2:7]] == [message.body for message in batches]
+    assert all(message.worker == 2 for message in recorded[2:7])
+    assert isinstance(recorded[2].body['batch'], int)
+
+def test_images_are_stored_once(tmp_path):
+    images = np.random.randint(0, 255, (16, 32, 32), dtype=np.uint8)
+    record(tmp_path / 'once.mldlog', [Message(MessageMode.Train_Set_Sample, {'x': images})])
+    record(tmp_path / 'many.mldlog', [Message(MessageMode.Train_Set_Sample, {'x': images})] * 10)
+    assert (tmp_path / 'many.mldlog').stat().st_size < (tmp_path / 'once.mldlog').stat().st_size * 1.5
+
+def test_each_message_keeps_its_time(tmp_path):
+    path = tmp_path / 'run.mldlog'
+    messages = [Message(MessageMode.Train_Batch_End, {'batch': i, 'loss': 1.0}, time=100.0 + i)
+                for i in range(0, 5)]
+    coalesced, merged = coalesceMessages(messages)
+    assert merged == 4 and coalesced[0].time == 104.0
+    record(path, messages)
+    assert [recordedtime for recordedtime, message in readLog(str(path))] == [100.0, 101.0, 102.0, 103.0, 104.0]
+
+def test_runs_in_one_file(tmp_path):
+    path = tmp_path / 'run.mldlog'
+    images = np.random.randint(0, 255, (2, 4, 4), dtype=np.uint8)
+    record(path, [Message(MessageMode.Train_Set_Sample, {'x': images}), Message(MessageMode.End, {})])
+    record(path, [Message(MessageMode.Train_Set_Sample, {'x': images}), Message(MessageMode.Epoch_End, {'loss': 1.0}),
+                  Message(MessageMode.End, {})])
+
+    assert len(logRuns(str(path))) == 2
+    first = [message for recordedtime, message in readLog(str(path), 0)]
+    last = [message for recordedtime, message in readLog(str(path))]
+    assert [message.mode for message in first] == [MessageMode.Train_Set_Sample, MessageMode.End]
+    assert [message.mode for message in last] == [MessageMode.Train_Set_Sample, MessageMode.Epoch_End,
+                                                  MessageMode.End]
+    assert np.array_equal(last[0].body['x'], images)
+    with pytest.raises(Exception):
+        list(readLog(str(path), 2))
+
+def test_dashboard_records_and_replays(tmp_path):
+    path = str(tmp_path / 'run.mldlog')
+    config = {"modules": [[["LossMetricsGraph", {}], ["BatchMetricsGraph", {}]]],
+              "config": {"width": 8, "height": 8, "rows": 1, "cols": 2, "refreshrate": 1},
+              "dashboard": {"workers": 0, "record": path}}
+    messages = [Message(MessageMode.Train_Batch_End, {'batch': i, 'step': i, 'loss': 1.0}) for i in range(0, 20)]
+    messages += [Message(MessageMode.Epoch_End, {'loss': 1.0}), Message(MessageMode.End, {})]
+    for run in range(0, 2):
+        Dashboard(config, list(messages), [], headless=True, framesink=BufferFrameSink()).runDashboardLoop()
+
+    assert len(logRuns(path)) == 2
+    assert [message.mode for recordedtime, message in readLog(path)] == [message.mode for message in messages]
+    sink = BufferFrameSink()
+    replayDashboard(path, config, speed=None, openatend=False, headless=True, framesink=sink)
+    assert sink.framecount > 0
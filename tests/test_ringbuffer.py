@@ -0,0 +1,141 @@
+import multiprocessing
+import threading
+import time
+import numpy as np
+import pytest
+from MLDashboard.MLCommunicationBackend import Message, MessageMode
+from MLDashboard.MLTransportBackend import ARENAHEADER, SharedArray, SharedMemoryRingBuffer
+
+def batch(i):
+    return Message(MessageMode.Train_Batch_End, {'batch': i, 'loss': float(i), 'padding': 'x' * 200})
+
+@pytest.fixture
+def buffer_factory():
+    buffers = []
+    def create(*args, **kwargs):
+        buffers.append(SharedMemoryRingBuffer(*args, **kwargs))
+        return buffers[-1]
+    yield create
+    for buffer in buffers:
+        buffer.close()
+
+def test_ring_buffer_order_and_wraparound(buffer_factory):
+    buffer = buffer_factory(4096)
+    received = []
+    for i in range(0, 200):
+        buffer.append(batch(i))
+        if i % 7 == 6:
+            received += buffer.drain()
+    received += [buffer.pop(0) for _ in range(0, len(buffer))]
+    assert [message.body['batch'] for message in received] == list(range(0, 200))
+    assert buffer.dropped == 0
+
+def test_ring_buffer_dropnewest(buffer_factory):
+    buffer = buffer_factory(2048, 'dropnewest')
+    for i in range(0, 50):
+        buffer.append(batch(i))
+    buffer.append(Message(MessageMode.End, {})) #control messages are never dropped
+    messages = buffer.drain()
+    batches = [message.body['batch'] for message in messages if message.mode == MessageMode.Train_Batch_End]
+    assert batches == list(range(0, len(batches)))
+    assert messages[-1].mode == MessageMode.End
+    assert buffer.dropped == 50 - len(batches) > 0
+
+def test_ring_buffer_dropoldest(buffer_factory):
+    buffer = buffer_factory(2048, 'dropoldest')
+    buffer.append(Message(MessageMode.Start, {})) #control messages are kept at the front
+    for i in range(0, 50):
+        buffer.append(batch(i))
+        if i == 3:
+            buffer.append(Message(MessageMode.ForceUpdate, {}))
+    messages = buffer.drain()
+    assert [message.mode for message in messages[:2]] == [MessageMode.Start, MessageMode.ForceUpdate]
+    batches = [message.body['batch'] for message in messages if message.mode == MessageMode.Train_Batch_End]
+    assert batches == list(range(50 - len(batches), 50))
+    assert buffer.dropped == 50 - len(batches) > 0
+
+def test_ring_buffer_block_waits_for_consumer(buffer_factory):
+    buffer = buffer_factory(2048, 'block')
+    thread = threading.Thread(target=lambda: [buffer.append(batch(i)) for i in range(0, 50)])
+    thread.start()
+    received = []
+    deadline = time.time() + 10
+    while len(received) < 50 and time.time() < deadline:
+        received += buffer.drain()
+        time.sleep(0.01)
+    thread.join(5)
+    assert [message.body['batch'] for message in received] == list(range(0, 50))
+    assert buffer.dropped == 0
+
+def test_ring_buffer_block_stops_when_consumer_exits(buffer_factory):
+    buffer = buffer_factory(2048, 'block')
+    consumer = multiprocessing.Process(target=time.sleep, args=(0,))
+    consumer.start()
+    consumer.join()
+    buffer.watch(consumer)
+    starttime = time.time()
+    with pytest.warns(UserWarning):
+        for i in range(0, 50):
+            buffer.append(batch(i))
+    assert time.time() - starttime < 5
+    assert buffer.dropped > 0
+
+def test_ring_buffer_rejects_large_message(buffer_factory):
+    buffer = buffer_factory(1024)
+    with pytest.raises(Exception):
+        buffer.append(Message(MessageMode.Train_Batch_End, {'padding': 'x' * 2000}))
+
+def test_ring_buffer_in_another_process(buffer_factory):
+    buffer = buffer_factory(4096, encoding='compact')
+    process = multiprocessing.Process(target=append_batches, args=(buffer, 100))
+    process.start()
+    received = []
+    deadline = time.time() + 10
+    while len(received) < 100 and time.time() < deadline:
+        received += buffer.drain()
+    process.join()
+    assert [message.body['batch'] for message in received] == list(range(0, 100))
+
+def append_batches(buffer, count):
+    for i in range(0, count):
+        buffer.append(Message(MessageMode.Train_Batch_End, {'batch': i, 'loss': float(i)}))
+
+def consume(buffer):
+    """Drains the buffer and releases every image like the dashboard does"""
+    messages = buffer.drain()
+    for message in messages:
+        buffer.imagearena.release(buffer.imagearena.resolve(message))
+    return messages
+
+@pytest.mark.parametrize("fullpolicy", ['dropoldest', 'dropnewest'])
+def test_dropped_messages_free_their_images(buffer_factory, fullpolicy):
+    buffer = buffer_factory(2048, fullpolicy, imagearenasize=8 * 832)
+    arena = buffer.imagearena
+    images = np.zeros((1, 784), dtype=np.uint8)
+    for i in range(0, 20): #the arena fills up, then images are sent in the messages
+        buffer.append(Message(MessageMode.Train_Set_Sample, {'x': arena.store(images), 'y': np.array([i])}))
+    assert buffer.dropped > 0
+    assert isinstance(arena.store(images), np.ndarray)
+
+    for _ in range(0, 2): #space of dropped messages is freed once the messages sent before them are handled
+        consume(buffer)
+    writepos, releasepos, droppedend = ARENAHEADER.unpack_from(arena.shm.buf, 0)
+    assert releasepos == writepos
+    ref = arena.store(images)
+    assert isinstance(ref, SharedArray)
+
+def test_dropped_images_are_freed_after_earlier_messages(buffer_factory):
+    buffer = buffer_factory(1024, 'dropnewest', imagearenasize=8 * 832)
+    arena = buffer.imagearena
+    images = np.zeros((1, 784), dtype=np.uint8)
+    for i in range(0, 4):
+        buffer.append(Message(MessageMode.Train_Set_Sample, {'x': arena.store(images), 'y': np.array([i])}))
+    assert buffer.dropped == 2
+    held = buffer.drain() #sent before the dropped messages, and still in use
+    writepos, releasepos, droppedend = ARENAHEADER.unpack_from(arena.shm.buf, 0)
+    assert releasepos == 0 and droppedend == writepos
+    for message in held:
+        arena.release(arena.resolve(message))
+    assert ARENAHEADER.unpack_from(arena.shm.buf, 0)[1] == 2 * 832
+    buffer.drain()
+    assert ARENAHEADER.unpack_from(arena.shm.buf, 0)[1] == writepos
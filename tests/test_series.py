@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+from MLDashboard.MLSeriesBackend import (RollingSeries, TieredSeries, MetricsStore, downsample, expandLimits,
+                                         exponentialSmoothing, lttb, minMaxDecimate)
+
+def test_rolling_series_order():
+    series = RollingSeries(5, 2)
+    for i in range(0, 12):
+        series.append(i, -i)
+    assert list(series.ordered()[:, 0]) == [7, 8, 9, 10, 11]
+    assert list(series.popOldest(2)[:, 0]) == [7, 8]
+    series.append(12, -12)
+    assert list(series.ordered()[:, 0]) == [9, 10, 11, 12]
+
+@pytest.mark.parametrize("retention", [(101, 10, 2), (100, 10, 2), (100, 10, 3), (150, 10, 1)])
+def test_tiered_series_stays_ordered(retention):
+    series = TieredSeries(*retention)
+    for i in range(0, 20000): #many demotions of the last tier
+        series.append(i, float(i))
+    x, mean, low, high = series.query()
+    assert np.all(np.diff(x) > 0)
+    assert np.all(low <= mean) and np.all(mean <= high)
+    assert low[0] == 0 and high[-1] == 19999 #the whole run is still covered
+    assert series.nbytes <= 5 * 8 * (retention[0] * retention[2] + 1) #bounded memory
+
+    x = series.query(5000, 6000)[0]
+    assert len(x) > 0
+    assert x[0] >= 5000 and x[-1] <= 6000
+
+def test_tiered_series_keeps_recent_points():
+    series = TieredSeries(100, 10, 2)
+    for i in range(0, 500):
+        series.append(i, i * 2.0, i * 2.0 - 1, i * 2.0 + 1)
+    x, mean, low, high = series.query(480)
+    assert list(x) == list(range(480, 500))
+    assert list(low) == list(mean - 1)
+
+def test_tiered_series_rejects_small_retention():
+    with pytest.raises(Exception):
+        TieredSeries(10, 10, 2)
+
+def test_metrics_store_record():
+    store = MetricsStore(100, 10, 2)
+    store.record('batch', {'batch': 0, 'loss': 2.0, 'count': 3, 'min': {'loss': 1.0}, 'max': {'loss': 4.0}}, 7)
+    store.record('batch', {'batch': 1, 'loss': 1.0, 'name': 'text'}, 8)
+    assert store.names('batch') == ['loss']
+    assert store.counts['batch'] == 2
+    x, mean, low, high = store.query('batch', 'loss')
+    assert list(x) == [7, 8]
+    assert list(low) == [1.0, 1.0] and list(high) == [4.0, 1.0]
+    assert store.series('epoch', 'loss') is None
+
+def test_downsampled_series_cache():
+    series = TieredSeries(1000, 10, 2)
+    for i in range(0, 900):
+        series.append(i, np.sin(i / 10))
+    x, y = series.downsampled(100)
+    assert len(x) == 100 and x[0] == 0 and x[-1] == 899
+    series.append(900, 0.0)
+    x, y = series.downsampled(100)
+    assert x[-1] == 900 and np.all(np.diff(x) > 0)
+
+@pytest.mark.parametrize("method", [lttb, minMaxDecimate])
+def test_downsampling_keeps_endpoints(method):
+    x = np.arange(0, 10000, dtype=np.float64)
+    y = np.random.default_rng(0).normal(size=10000)
+    y[5000] = 100 #a spike
+    dx, dy = method(x, y, 50)
+    assert dx[0] == 0 and dx[-1] == 9999
+    assert np.all(np.diff(dx) > 0)
+    assert len(dx) <= 102 #plus the first and last points
+    assert 100 in dy
+
+def test_downsampling_short_lines_unchanged():
+    x = np.arange(0, 10, dtype=np.float64)
+    for method in ['lttb', 'minmax']:
+        dx, dy = downsample(x, x, 100, method)
+        assert len(dx) == 10
+    with pytest.raises(Exception):
+        downsample(x, x, 5, 'nosuchmethod')
+
+def test_expand_limits():
+    limits = expandLimits((np.inf, -np.inf), 0, 10)
+    assert limits == (-1, 11)
+    assert expandLimits(limits, 1, 9) == limits
+    low, high = expandLimits(limits, 0, 20)
+    assert low == -1 and high > 20
+
+@pytest.mark.parametrize("weight", [0.0, 0.01, 0.6, 0.999])
+def test_exponential_smoothing(weight):
+    y = np.random.default_rng(1).random(3000)
+    expected = []
+    ema = y[0]
+    for value in y:
+        ema = weight * ema + (1 - weight) * value
+        expected.append(ema)
+    assert np.allclose(exponentialSmoothing(y, weight), expected)
+
+def test_latest_points():
+    series = TieredSeries(100, 10, 2)
+    for i in range(0, 1000):
+        series.append(i, float(i))
+    assert list(series.latest(5)[0]) == [995, 996, 997, 998, 999]
+    x = series.latest(150)[0] #past the first tier
+    assert len(x) == 150 and x[-1] == 999 and np.all(np.diff(x) > 0)
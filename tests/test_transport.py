@@ -0,0 +1,256 @@
+import multiprocessing
+import pickle
+import socket
+import time
+import numpy as np
+import pytest
+from MLDashboard.MLCommunicationBackend import Message, MessageMode
+from MLDashboard.MLDashboardBackend import Dashboard
+from MLDashboard.MLRenderBackend import BufferFrameSink
+from MLDashboard.MLTransportBackend import (BatchMerger, CommandQueue, SharedImageArena, SocketSender,
+                                            SocketServer, parseAddress, takeMessages)
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+class Exploit:
+    def __reduce__(self):
+        return (exec, ("import builtins; builtins.exploited = True",))
+
+def test_default_host_is_loopback():
+    assert parseAddress('tcp://:8765') == (socket.AF_INET, ('127.0.0.1', 8765))
+
+def test_socket_round_trip():
+    server = SocketServer('tcp://127.0.0.1:0', authkey=b'key')
+    sender = SocketSender(server.address, worker=3, authkey=b'key')
+    try:
+        sender.append(Message(MessageMode.Epoch_End, {'loss': 1.0}))
+        sender.append(Message(MessageMode.Train_Batch_End, {'batch': 0, 'loss': 2.0}))
+        assert wait_for(lambda: len(server) == 2)
+        messages = server.drain()
+        assert [message.mode for message in messages] == [MessageMode.Epoch_End, MessageMode.Train_Batch_End]
+        assert messages[1].worker == 3 #epochs are merged across workers
+
+        server.returnlist.append(Message(MessageMode.Start, {}))
+        assert sender.returnlist.waitForStart(5)
+    finally:
+        sender.close(1)
+        server.close()
+
+def test_socket_rejects_wrong_authkey():
+    server = SocketServer('tcp://127.0.0.1:0', authkey=b'key')
+    with pytest.warns(UserWarning):
+        sender = SocketSender(server.address, authkey=b'other', retry=0.05)
+        sender.append(Message(MessageMode.Epoch_End, {'loss': 1.0}))
+        time.sleep(0.5)
+    try:
+        assert len(server) == 0
+        assert len(server.connections) == 0
+    finally:
+        sender.close(0)
+        server.close()
+
+def test_socket_does_not_unpickle_before_handshake():
+    import builtins
+    server = SocketServer('tcp://127.0.0.1:0', authkey=b'key')
+    family, address = parseAddress(server.address)
+    try:
+        with socket.socket(family, socket.SOCK_STREAM) as sock:
+            sock.connect(address)
+            data = pickle.dumps([Exploit()])
+            sock.sendall(len(data).to_bytes(4, 'little') + data)
+            sock.settimeout(5)
+            try:
+                sock.recv(64) #server challenge
+                assert sock.recv(64) == b'' #closed after the wrong answer
+            except ConnectionResetError:
+                pass
+        assert not getattr(builtins, 'exploited', False)
+    finally:
+        server.close()
+
+def test_socket_needs_authkey(monkeypatch):
+    monkeypatch.delenv('MLDASHBOARD_AUTHKEY', raising=False)
+    with pytest.raises(Exception):
+        SocketServer('tcp://127.0.0.1:0')
+
+def test_socket_end_waits_for_flushtimeout():
+    server = SocketServer('tcp://127.0.0.1:0', authkey=b'key')
+    sender = SocketSender(server.address, authkey=b'key', flushtimeout=5.0)
+    try:
+        sender.append(Message(MessageMode.End, {}))
+        assert len(sender) == 0
+        assert wait_for(lambda: len(server) == 1)
+    finally:
+        sender.close(1)
+        server.close()
+
+def test_socket_end_does_not_wait_without_a_dashboard():
+    server = SocketServer('tcp://127.0.0.1:0', authkey=b'key')
+    address = server.address
+    server.close() #nothing listens on the port
+    sender = SocketSender(address, authkey=b'key', retry=0.05)
+    try:
+        starttime = time.time()
+        for step in range(0, 20000):
+            sender.append(Message(MessageMode.Train_Batch_End, {'batch': step, 'step': step, 'loss': 1.0}))
+        sender.append(Message(MessageMode.End, {}))
+        assert time.time() - starttime < 1.0
+        assert len(sender) == 10000 #maxqueue, End is kept
+    finally:
+        starttime = time.time()
+        with pytest.warns(UserWarning):
+            sender.close()
+        assert time.time() - starttime < 1.0
+
+def test_socket_disconnect_without_end():
+    server = SocketServer('tcp://127.0.0.1:0', authkey=b'key', disconnecttimeout=0.2)
+    sender = SocketSender(server.address, authkey=b'key')
+    try:
+        sender.append(Message(MessageMode.Epoch_End, {'loss': 1.0}))
+        assert wait_for(lambda: len(server) == 1)
+        sender.close(1)
+        for connection in list(server.connections.values()):
+            connection[0].shutdown(socket.SHUT_RDWR)
+        messages = []
+        with pytest.warns(UserWarning):
+            assert wait_for(lambda: messages.extend(server.drain()) or
+                            any(message.mode == MessageMode.End for message in messages))
+    finally:
+        server.close()
+
+def test_batches_from_two_workers_are_merged_in_order():
+    server = SocketServer('tcp://127.0.0.1:0', authkey=b'key')
+    senders = [SocketSender(server.address, worker=worker, authkey=b'key') for worker in range(0, 2)]
+    try:
+        assert wait_for(lambda: len(server.connections) == 2)
+        for step in range(0, 200):
+            for worker, sender in enumerate(senders):
+                if worker == 1 and step % 50 == 0:
+                    time.sleep(0.05) #worker 1 falls behind
+                sender.append(Message(MessageMode.Train_Batch_End, {'batch': step, 'step': step,
+                                                                    'loss': 1.0 + 4.0 * worker}))
+        for sender in senders:
+            sender.append(Message(MessageMode.End, {}))
+        config = {"modules": [[["BatchMetricsGraph", {}]]],
+                  "config": {"width": 8, "height": 8, "rows": 1, "cols": 1, "refreshrate": 1},
+                  "dashboard": {"workers": 0}}
+        dashboard = Dashboard(config, server, server.returnlist, headless=True, framesink=BufferFrameSink())
+        dashboard.runDashboardLoop()
+
+        x, y, low, high = dashboard.store.query('batch', 'loss')
+        assert np.all(np.diff(x) > 0)
+        assert np.array_equal(x, np.arange(0, 200))
+        assert np.allclose(y, 3.0) and np.allclose(low, 1.0) and np.allclose(high, 5.0)
+    finally:
+        for sender in senders:
+            sender.close(1)
+        server.close()
+
+def test_batch_merger_waits_for_every_sender():
+    merger = BatchMerger(timeout=30.0)
+    merger.add(0, {'step': 0, 'loss': 1.0})
+    assert len(merger.ready({0, 1})) == 0 #worker 1 has not reached step 0
+    assert len(merger.ready({0})) == 1
+    merger.add(1, {'step': 1, 'loss': 2.0})
+    assert len(merger.ready({0, 1})) == 0 #worker 0 has not reached step 1
+    merger.add(0, {'step': 2, 'loss': 1.0})
+    merger.add(1, {'step': 0, 'loss': 9.0}) #late, step 0 was already sent
+    assert [message.body['step'] for message in merger.ready({0, 1})] == [1]
+    assert merger.pending.keys() == {2}
+
+def test_server_does_not_wait_for_workers_without_batches():
+    server = SocketServer('tcp://127.0.0.1:0', authkey=b'key')
+    senders = [SocketSender(server.address, worker=worker, authkey=b'key') for worker in range(0, 2)]
+    try:
+        assert wait_for(lambda: len(server.connections) == 2)
+        senders[0].append(Message(MessageMode.Train_Batch_End, {'batch': 0, 'step': 0, 'loss': 1.0}))
+        time.sleep(0.2)
+        assert len(server.drain()) == 0 #worker 1 may still send step 0
+        senders[1].append(Message(MessageMode.Epoch_End, {'loss': 1.0}))
+        messages = []
+        assert wait_for(lambda: messages.extend(server.drain()) or
+                        any(message.mode == MessageMode.Train_Batch_End for message in messages))
+    finally:
+        for sender in senders:
+            sender.close(1)
+        server.close()
+
+def send_requests(returnlist):
+    for i in range(0, 50):
+        returnlist.append(Message(MessageMode.Train_Set_Sample, {'num': i}))
+    returnlist.append(Message(MessageMode.Start, {}))
+
+def test_command_queue_requests_arrive_before_start():
+    returnlist = CommandQueue()
+    process = multiprocessing.Process(target=send_requests, args=(returnlist,))
+    process.start()
+    try:
+        assert returnlist.waitForStart(10)
+        assert returnlist.started
+        requests = returnlist.take([MessageMode.Train_Set_Sample])
+        assert [request.body['num'] for request in requests] == list(range(0, 50))
+    finally:
+        process.join()
+
+def test_command_queue_take_and_list_api():
+    returnlist = CommandQueue(local=True)
+    assert not returnlist.waitForStart(0.05)
+    for mode in [MessageMode.Command, MessageMode.Train_Set_Sample, MessageMode.Command]:
+        returnlist.append(Message(mode, {}))
+    assert len(returnlist) == 3
+    assert returnlist.pop(returnlist.index(returnlist[1])).mode == MessageMode.Train_Set_Sample
+    assert [message.mode for message in returnlist] == [MessageMode.Command, MessageMode.Command]
+    assert len(takeMessages(returnlist, [MessageMode.Command])) == 2
+    assert len(returnlist) == 0
+
+def test_take_messages_from_list():
+    returnlist = [Message(MessageMode.Command, {'i': 0}), Message(MessageMode.Start, {}),
+                  Message(MessageMode.Command, {'i': 1})]
+    taken = takeMessages(returnlist, [MessageMode.Command])
+    assert [message.body['i'] for message in taken] == [0, 1]
+    assert len(returnlist) == 1
+
+def test_image_arena_store_and_release():
+    arena = SharedImageArena(4096)
+    try:
+        images = np.arange(0, 2 * 28 * 28, dtype=np.uint8).reshape(2, 784)
+        ref = arena.store(images)
+        assert np.array_equal(arena.view(ref), images)
+        taken = arena.take(images, np.array([1]))
+        assert np.array_equal(arena.view(taken), images[[1]])
+
+        message = Message(MessageMode.Train_Set_Sample, {'x': ref, 'y': np.array([0, 1])})
+        refs = arena.resolve(message)
+        assert np.array_equal(message.body['x'], images)
+        last = arena.store(images)
+        assert isinstance(last, type(ref))
+        assert isinstance(arena.store(images), np.ndarray) #full until the dashboard releases
+        arena.release(refs + [taken, last])
+        assert np.array_equal(arena.view(arena.store(images)), images) #space is reused from the start
+
+        big = np.zeros((10, 784), dtype=np.uint8) #larger than the arena, sent in the message instead
+        assert isinstance(arena.store(big), np.ndarray)
+    finally:
+        arena.close()
+
+def store_images(arena, images, returnlist):
+    returnlist.put(arena.store(images))
+
+def test_image_arena_in_another_process():
+    arena = SharedImageArena(4096)
+    returnlist = multiprocessing.Queue()
+    images = np.random.randint(0, 255, (3, 100), dtype=np.uint8)
+    process = multiprocessing.Process(target=store_images, args=(arena, images, returnlist))
+    process.start()
+    try:
+        ref = returnlist.get(timeout=10)
+        assert np.array_equal(arena.view(ref), images)
+    finally:
+        process.join()
+        arena.close()